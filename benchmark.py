@@ -0,0 +1,394 @@
+"""Offline load test for the poll bot's hot paths.
+
+Drives the real handlers in main.py (PollVoteButton.callback, create_poll_embed,
+the persistence writer and on_message sticky handling) with stand-in Discord
+objects and a simulated REST layer, then reports latency, throughput, disk
+writes and REST traffic.
+
+    python benchmark.py --users 5000 --options 30 --polls 4 --latency 0.05
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import discord
+
+# Route every state file into a scratch directory before main.py loads state
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCRATCH = tempfile.mkdtemp(prefix="pollbot-bench-")
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+os.chdir(SCRATCH)
+sys.path.insert(0, ROOT)
+
+# Guild IDs handed out to the simulated guilds
+FIRST_GUILD_ID = 1_000
+
+
+class SimulatedREST:
+    """Fake Discord REST layer with per-route buckets that answer 429 when exhausted.
+
+    Every call it sees comes through main.RestQueue, so the 429s exercise the queue's
+    bucket holds and retries.
+    """
+
+    def __init__(self, latency: float, bucket_size: int, bucket_window: float):
+        self.latency = latency
+        self.bucket_size = bucket_size
+        self.bucket_window = bucket_window
+        self.buckets = {}  # route -> (window start, calls in window)
+        self.calls = {}
+        self.rate_limited = 0
+
+    async def request(self, route: str):
+        """Issue one call; an exhausted bucket raises RateLimited for the caller (RestQueue) to hold and retry"""
+        self.calls[route.split(':')[0]] = self.calls.get(route.split(':')[0], 0) + 1
+        await asyncio.sleep(self.latency)
+
+        now = time.monotonic()
+        window_start, used = self.buckets.get(route, (now, 0))
+        if now - window_start >= self.bucket_window:
+            window_start, used = now, 0
+        if used < self.bucket_size:
+            self.buckets[route] = (window_start, used + 1)
+            return
+
+        self.rate_limited += 1
+        raise discord.RateLimited(window_start + self.bucket_window - now)
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+class FakeMessage:
+    def __init__(self, rest: SimulatedREST, channel, message_id: int):
+        self.rest = rest
+        self.channel = channel
+        self.id = message_id
+
+    async def edit(self, **kwargs):
+        await self.rest.request(f"edit:{self.channel.id}:{self.id}")
+        return self
+
+    async def delete(self):
+        await self.rest.request(f"delete:{self.channel.id}")
+
+
+class FakeChannel:
+    def __init__(self, rest: SimulatedREST, channel_id: int, guild_id: int):
+        self.rest = rest
+        self.id = channel_id
+        self.guild = SimpleNamespace(id=guild_id)
+        self.name = f"channel-{channel_id}"
+        self.mention = f"<#{channel_id}>"
+        self.last_message_id = None
+        self.next_message_id = channel_id * 1_000_000
+
+    def new_message_id(self) -> int:
+        self.next_message_id += 1
+        self.last_message_id = self.next_message_id
+        return self.next_message_id
+
+    async def send(self, content=None, **kwargs):
+        await self.rest.request(f"send:{self.id}")
+        return FakeMessage(self.rest, self, self.new_message_id())
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return FakeMessage(self.rest, self, message_id)
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await self.rest.request(f"fetch:{self.id}")
+        return FakeMessage(self.rest, self, message_id)
+
+
+class FakeResponse:
+    """Interaction response; the initial response has its own (unlimited) route"""
+
+    def __init__(self, rest: SimulatedREST):
+        self.rest = rest
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def send_message(self, *args, **kwargs):
+        self.done = True
+        await asyncio.sleep(self.rest.latency)
+        self.rest.calls["interaction"] = self.rest.calls.get("interaction", 0) + 1
+
+    async def edit_message(self, **kwargs):
+        await self.send_message()
+
+    async def defer(self, **kwargs):
+        await self.send_message()
+
+
+def fake_member(user_id: int, role_ids):
+    return SimpleNamespace(
+        id=user_id,
+        bot=False,
+        display_name=f"user-{user_id}",
+        roles=[SimpleNamespace(id=role_id) for role_id in role_ids],
+        guild_permissions=SimpleNamespace(administrator=False),
+    )
+
+
+def fake_interaction(rest: SimulatedREST, user, channel: FakeChannel, message: FakeMessage, guild_id: int):
+    return SimpleNamespace(
+        id=random.getrandbits(62),
+        user=user,
+        guild_id=guild_id,
+        channel=channel,
+        channel_id=channel.id,
+        message=message,
+        response=FakeResponse(rest),
+    )
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def bytes_written(bot) -> int:
+    """Bytes the loaded guilds' storage backends have written so far.
+
+    Counted by the backends themselves: SQLite writes from worker threads and through
+    its own I/O, which the process-wide write counters do not reliably show.
+    """
+    return sum(state.storage.bytes_written for state in bot.guild_states.values())
+
+
+def make_poll(main, option_count: int, channel: FakeChannel, message_id: int) -> dict:
+    return {
+        "question": "Benchmark poll",
+        "titles": [f"Option {i}" for i in range(option_count)],
+        "image_urls": [f"https://example.com/{i}.png" for i in range(option_count)],
+        "emotes": [chr(0x1F600 + i) for i in range(option_count)],
+        "multi_vote_config": {"2000": 3},
+        "single_vote_roles": [],
+        "blocked_roles": [1000],
+        "color": 0x3498db,
+        "end_time": "2099-01-01T00:00:00",
+        "votes": main.empty_tally(option_count),
+        "user_votes": {},
+        "channel_id": channel.id,
+        "message_id": message_id,
+    }
+
+
+async def bench_votes(main, args, rest: SimulatedREST) -> dict:
+    """Replay a vote storm: N users voting across K polls with M options, spread over G guilds"""
+    bot = main.bot
+    polls = []
+    for k in range(args.polls):
+        state = await bot.guild_state(FIRST_GUILD_ID + k % args.guilds)
+        channel = FakeChannel(rest, 100 + k, state.guild_id)
+        message = FakeMessage(rest, channel, channel.new_message_id())
+        poll_id = f"bench{k}"
+        state.add_poll(poll_id, make_poll(main, args.options, channel, message.id))
+        polls.append((state, poll_id, channel, message))
+
+    # Roughly 1 in 20 voters is blocked and 1 in 10 may vote three times
+    members = []
+    for user_id in range(1, args.users + 1):
+        roll = random.random()
+        roles = [1000] if roll < 0.05 else [2000] if roll < 0.15 else [3000]
+        members.append(fake_member(10_000 + user_id, roles))
+
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def click(member):
+        state, poll_id, channel, message = random.choice(polls)
+        button = main.PollVoteButton(random.randrange(args.options), "👍", poll_id)
+        interaction = fake_interaction(rest, member, channel, message, state.guild_id)
+        async with semaphore:
+            started = time.perf_counter()
+            await button.callback(interaction)
+            latencies.append(time.perf_counter() - started)
+
+    # Write out the polls' snapshots first, so only what the votes cost is counted
+    for state in bot.guild_states.values():
+        await state.persistence.flush()
+    written_before = bytes_written(bot)
+    calls_before = rest.total_calls
+    started = time.perf_counter()
+    await asyncio.gather(*(click(member) for member in members))
+    elapsed = time.perf_counter() - started
+
+    # Let background edits and writes settle before counting them
+    await drain(bot)
+
+    votes_cast = sum(sum(state.active_polls[poll_id]['votes']) for state, poll_id, _, _ in polls)
+    return {
+        "clicks": len(latencies),
+        "votes_cast": votes_cast,
+        "handler_p50_ms": percentile(latencies, 0.50) * 1000,
+        "handler_p99_ms": percentile(latencies, 0.99) * 1000,
+        "votes_per_sec": votes_cast / elapsed if elapsed else 0.0,
+        "bytes_written": bytes_written(bot) - written_before,
+        "rest_calls": rest.total_calls - calls_before,
+    }
+
+
+def bench_embed(main, args) -> dict:
+    """Time create_poll_embed for one M-option poll, built from scratch and patched after a vote"""
+    channel = SimpleNamespace(id=1)
+    poll_data = make_poll(main, args.options, channel, 1)
+    for option_index in range(args.options):
+        poll_data['votes'][option_index] = random.randrange(10_000)
+
+    cold, patched = [], []
+    for iteration in range(args.embed_iterations):
+        main.bot.embed_cache.invalidate(("poll", "embed-bench"))
+        started = time.perf_counter()
+        main.create_poll_embed(poll_data, "embed-bench")
+        cold.append(time.perf_counter() - started)
+
+        poll_data['votes'][iteration % args.options] += 1
+        started = time.perf_counter()
+        main.create_poll_embed(poll_data, "embed-bench")
+        patched.append(time.perf_counter() - started)
+    return {
+        "embed_p50_us": percentile(cold, 0.50) * 1e6,
+        "embed_p99_us": percentile(cold, 0.99) * 1e6,
+        "embed_patch_p50_us": percentile(patched, 0.50) * 1e6,
+        "embed_patch_p99_us": percentile(patched, 0.99) * 1e6,
+    }
+
+
+async def bench_save(main) -> dict:
+    """Time a full flush of every active poll through each guild's persistence writer"""
+    bot = main.bot
+    for state in bot.guild_states.values():
+        for poll_id in state.active_polls:
+            state.save_poll(poll_id)
+
+    written_before = bytes_written(bot)
+    started = time.perf_counter()
+    await asyncio.gather(*(state.persistence.flush() for state in bot.guild_states.values()))
+    return {
+        "full_save_ms": (time.perf_counter() - started) * 1000,
+        "full_save_bytes": bytes_written(bot) - written_before,
+    }
+
+
+async def bench_sticky(main, args, rest: SimulatedREST) -> dict:
+    """Send a burst of messages into a sticky channel through on_message"""
+    bot = main.bot
+    channel = FakeChannel(rest, 999, FIRST_GUILD_ID)
+    state = await bot.guild_state(FIRST_GUILD_ID)
+    state.sticky_notes[str(channel.id)] = {
+        "type": "message", "content": "Read the rules!", "creator_id": 1, "channel_id": channel.id, "message_id": None,
+    }
+    state.save_sticky_note(str(channel.id))
+
+    calls_before = rest.total_calls
+    latencies = []
+    started = time.perf_counter()
+    for i in range(args.sticky_messages):
+        channel.new_message_id()
+        message = SimpleNamespace(author=fake_member(50_000 + i, []), channel=channel, guild=channel.guild)
+        handler_started = time.perf_counter()
+        await bot.on_message(message)
+        latencies.append(time.perf_counter() - handler_started)
+        await asyncio.sleep(args.sticky_interval)
+    elapsed = time.perf_counter() - started
+
+    await drain(bot)
+    return {
+        "messages": args.sticky_messages,
+        "on_message_p99_ms": percentile(latencies, 0.99) * 1000,
+        "sticky_rest_calls": rest.total_calls - calls_before,
+        "messages_per_sec": args.sticky_messages / elapsed if elapsed else 0.0,
+    }
+
+
+async def drain(bot):
+    """Wait for pending embed refreshes, sticky reposts and persistence to finish"""
+    while True:
+        tasks = [task for task, _ in bot.embed_refresher.pending.values()]
+        tasks += list(bot.sticky_scheduler.tasks.values())
+        if not tasks:
+            break
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for state in bot.guild_states.values():
+        await state.persistence.flush()
+
+
+async def run(args) -> dict:
+    import main
+    random.seed(args.seed)
+
+    rest = SimulatedREST(args.latency, args.bucket_size, args.bucket_window)
+    # Guild state loaded from here on starts its persistence writer, as it would after setup_hook
+    main.bot.persistence_started = True
+    main.bot.rest_queue.start()
+
+    results = {"config": vars(args)}
+    results["votes"] = await bench_votes(main, args, rest)
+    results["embed"] = bench_embed(main, args)
+    results["save"] = await bench_save(main)
+    results["sticky"] = await bench_sticky(main, args, rest)
+    results["rest"] = {
+        "calls_by_route": dict(rest.calls),
+        "rate_limited": rest.rate_limited,
+        "queue_retries": sum(
+            main.metrics.counter("rest_actions_total", (("kind", kind), ("result", "retried"))) for kind in main.REST_PRIORITIES
+        ),
+    }
+
+    main.bot.rest_queue.stop()
+    for state in main.bot.guild_states.values():
+        await state.persistence.close()
+    return results
+
+
+def print_report(results: dict):
+    for section, values in results.items():
+        if section == "config":
+            continue
+        print(f"[{section}]")
+        for key, value in values.items():
+            if isinstance(value, float):
+                value = f"{value:,.2f}"
+            print(f"  {key:<20} {value}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000, help="voters in the storm")
+    parser.add_argument("--options", type=int, default=30, help="options per poll")
+    parser.add_argument("--polls", type=int, default=3, help="concurrent polls")
+    parser.add_argument("--guilds", type=int, default=1, help="guilds the polls are spread over")
+    parser.add_argument("--concurrency", type=int, default=200, help="clicks in flight at once")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated REST latency in seconds")
+    parser.add_argument("--bucket-size", type=int, default=5, help="calls allowed per route per window before 429s")
+    parser.add_argument("--bucket-window", type=float, default=1.0, help="rate limit window in seconds")
+    parser.add_argument("--embed-iterations", type=int, default=2000)
+    parser.add_argument("--sticky-messages", type=int, default=200)
+    parser.add_argument("--sticky-interval", type=float, default=0.005, help="seconds between sticky channel messages")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    os.environ["STORAGE_BACKEND"] = args.backend
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main_cli()
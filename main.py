@@ -3,150 +3,2500 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from discord import ui
+from aiohttp import web
 import json
+import logging
 import os
 import re
+import sqlite3
+import sys
 from datetime import datetime, timedelta
 from typing import Optional, List
 import asyncio
+import bisect
+import contextlib
+import copy
+import csv
+import functools
+import gzip
+import hashlib
+import heapq
+import io
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import zlib
+from array import array
+from collections import OrderedDict
 
-# Your server's Guild ID
-GUILD_ID = 1384268371452756089
+# Guild that owned the state files written before multi-guild support; they are moved into its data directory
+GUILD_ID = int(os.getenv('GUILD_ID', '1384268371452756089'))
 
-# Configuration file for role permissions
+# Each guild's state lives in its own directory under DATA_DIRECTORY, loaded on first use
+DATA_DIRECTORY = os.getenv('DATA_DIRECTORY', 'data')
+
+# Guilds to sync slash commands to directly (comma separated); commands are synced globally when empty
+COMMAND_GUILD_IDS = [int(guild_id) for guild_id in os.getenv('COMMAND_GUILD_IDS', '').split(',') if guild_id.strip()]
+
+# Hash of the last synced command payload per scope; commands are only synced when it changes
+COMMAND_HASH_FILE = os.path.join(DATA_DIRECTORY, "command_sync.json")
+FORCE_COMMAND_SYNC = os.getenv('FORCE_COMMAND_SYNC', 'false').lower() in ('1', 'true', 'yes') or '--force-sync' in sys.argv
+
+# Run as an AutoShardedBot; SHARD_COUNT overrides the shard count Discord recommends
+SHARDED = os.getenv('SHARDED', 'false').lower() in ('1', 'true', 'yes')
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+
+# State files, per guild directory
 CONFIG_FILE = "role_config.json"
 POLLS_FILE = "active_polls.json"
 PREVIEWS_FILE = "poll_previews.json"
 STICKY_NOTES_FILE = "sticky_notes.json"
+ARCHIVE_DIRECTORY = "archive"  # Closed polls with their votes, one gzipped JSON file each
+
+# Append-only journal of votes cast since the last active_polls.json snapshot
+VOTE_JOURNAL_FILE = "poll_votes.journal"
+JOURNAL_COMPACT_THRESHOLD = 5000  # Journal records before folding them into a snapshot
+
+# Storage backend: "json" (state files above) or "sqlite" (single WAL-mode database)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+DATABASE_FILE = "glambot.db"
+
+# Minimum seconds between vote-driven edits of a poll message
+POLL_EMBED_REFRESH_SECONDS = float(os.getenv('POLL_EMBED_REFRESH_SECONDS', '2'))
+
+# Sticky notes are reposted once a channel has been quiet this long...
+STICKY_QUIET_SECONDS = 3.0
+# ...or at the latest this long after the first message that buried them
+STICKY_MAX_WAIT_SECONDS = 15.0
+
+# Recent permission decisions kept per (guild, member, command)
+PERMISSION_CACHE_SIZE = 1024
+
+# Rendered poll, preview and sticky note embeds kept for reuse
+EMBED_CACHE_SIZE = 256
+
+# Discord embed limits, and how long lists are split into pages
+EMBED_MAX_FIELDS = 25
+EMBED_TOTAL_LIMIT = 6000  # Characters across title, description, fields and footer
+EMBED_FIELD_NAME_LIMIT = 256
+EMBED_FIELD_VALUE_LIMIT = 1024
+EMBED_FOOTER_RESERVE = 64  # Characters kept free on every page for the page counter footer
+EMBED_PAGE_SIZE = 10
+EMBED_PAGE_CACHE_SECONDS = 30  # Rendered pages are reused this long before reflecting new data
+EMBED_PAGINATOR_TIMEOUT = 300
+POLL_PAGE_SIZE = 20  # Options (and vote buttons) per page for polls too large for one embed
+
+# Working set of loaded guild state: guilds idle this long, or beyond the size limit, are unloaded
+GUILD_IDLE_SECONDS = 1800
+GUILD_CACHE_SIZE = int(os.getenv('GUILD_CACHE_SIZE', '200'))
+MAINTENANCE_INTERVAL_SECONDS = 300
+
+# Poll previews that were never started expire after this many days (0 keeps them forever)
+PREVIEW_TTL_DAYS = float(os.getenv('PREVIEW_TTL_DAYS', '30'))
+
+# Polls closed concurrently when many expire at the same moment
+POLL_CLOSE_BATCH_SIZE = 10
+
+# Scheduled polls started concurrently when many are due at the same moment
+POLL_START_CONCURRENCY = 5
+
+# /pollexport files larger than this are gzipped
+POLL_EXPORT_GZIP_BYTES = 1_000_000
+
+# /pollimport limits, and the minimum gap between the starts of imported polls
+POLL_IMPORT_MAX_POLLS = 100
+POLL_IMPORT_MAX_BYTES = 1_000_000
+POLL_IMPORT_STAGGER_SECONDS = 2.0
+
+# Background persistence: changes are coalesced and flushed after a short quiet period
+PERSIST_DEBOUNCE_SECONDS = 1.0
+PERSIST_BATCH_SIZE = 500  # Pending changes that force an immediate flush
+PERSIST_RETRY_SECONDS = 5.0  # Wait before retrying a batch whose write failed
+
+# Outbound REST queue: background message sends/edits/deletes run by priority (lower first)
+REST_PRIORITIES = {
+    "command": 0,  # Follow-up messages of a command someone is waiting on
+    "poll_close": 1,
+    "poll_start": 2,  # Scheduled and imported polls
+    "poll_refresh": 3,
+    "sticky": 4,
+    "migration": 5,
+}
+REST_QUEUE_WORKERS = 4
+REST_MAX_ATTEMPTS = 3  # Tries for a request that fails with a server error
+# Rate limit waits longer than this are handed back to the queue instead of sleeping (discord.py's minimum is 30)
+REST_MAX_RATELIMIT_WAIT = 30.0
+
+def read_json_file(path: str, default):
+    """Load a JSON document, returning default if the file does not exist"""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return default
+
+def write_json_file(path: str, data, indent: Optional[int] = 2):
+    """Atomically write a JSON document (temp file + rename) and return its size in bytes"""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=indent, separators=None if indent else (',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(temp_path, path)
+    return size
+
+# Local Prometheus endpoint for the bot's metrics (set METRICS_PORT=0 to disable)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+LOOP_LAG_INTERVAL_SECONDS = 0.5
+
+# Event loop watchdog: a stall longer than this captures the blocking handler's stack (0 disables)
+LOOP_WATCHDOG_MS = float(os.getenv('LOOP_WATCHDOG_MS', '0'))
+LOOP_WATCHDOG_KEEP = 20  # Worst stalls kept for /loopstalls and the profile file
+LOOP_PROFILE_FILE = "loop_profile.json"
+
+# Histogram buckets (seconds) shared by every latency metric
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+    
+    __slots__ = ('counts', 'sum', 'count')
+    
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return float('inf') if self.counts[-1] else 0.0
+
+class Metrics:
+    """In-process counters, gauges and latency histograms, rendered in Prometheus text format.
+    
+    Labels are tuples of (name, value) pairs so recording is a dict update.
+    """
+    
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {}  # (name, labels) -> value
+        self.gauges = {}  # (name, labels) -> value
+        self.gauge_callbacks = {}  # name -> callable returning the current value
+        self.histograms = {}  # (name, labels) -> Histogram
+    
+    def inc(self, name: str, labels: tuple = (), value: float = 1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+    
+    def set_gauge(self, name: str, value: float, labels: tuple = ()):
+        self.gauges[(name, labels)] = value
+    
+    def gauge_callback(self, name: str, callback):
+        """Register a gauge whose value is read when metrics are rendered"""
+        self.gauge_callbacks[name] = callback
+    
+    def observe(self, name: str, value: float, labels: tuple = ()):
+        histogram = self.histograms.get((name, labels))
+        if histogram is None:
+            histogram = self.histograms[(name, labels)] = Histogram()
+        histogram.observe(value)
+    
+    def counter(self, name: str, labels: tuple = ()) -> float:
+        return self.counters.get((name, labels), 0)
+    
+    def counter_total(self, name: str) -> float:
+        return sum(value for (counter_name, _), value in self.counters.items() if counter_name == name)
+    
+    def histogram(self, name: str, labels: tuple = ()) -> Histogram:
+        return self.histograms.get((name, labels)) or Histogram()
+    
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format"""
+        def series(name, labels, extra=()):
+            pairs = labels + extra
+            if not pairs:
+                return f"pollbot_{name}"
+            return f"pollbot_{name}{{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+        
+        lines = []
+        typed = set()
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE pollbot_{name} {kind}")
+        
+        for (name, labels), value in sorted(self.counters.items()):
+            declare(name, "counter")
+            lines.append(f"{series(name, labels)} {value}")
+        
+        gauges = dict(self.gauges)
+        for name, callback in self.gauge_callbacks.items():
+            gauges[(name, ())] = callback()
+        gauges[("uptime_seconds", ())] = time.time() - self.started
+        for (name, labels), value in sorted(gauges.items()):
+            declare(name, "gauge")
+            lines.append(f"{series(name, labels)} {value}")
+        
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f"{series(name + '_bucket', labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{series(name + '_bucket', labels, (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{series(name + '_sum', labels)} {histogram.sum}")
+            lines.append(f"{series(name + '_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+# Code objects of known handlers, so a sampled stack can be attributed to one
+HANDLER_CODES = {}
+
+def timed(kind: str, name: str):
+    """Record an async handler's latency under handler_latency_seconds{kind, name}"""
+    labels = (("kind", kind), ("name", name))
+    def decorator(func):
+        HANDLER_CODES[func.__code__] = f"{kind}:{name}"
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                metrics.observe("handler_latency_seconds", time.perf_counter() - started, labels)
+        return wrapper
+    return decorator
+
+class RateLimitLogHandler(logging.Handler):
+    """Counts the 429 responses discord.py logs before it retries a request"""
+    
+    def emit(self, record: logging.LogRecord):
+        if record.levelno >= logging.WARNING and "rate limit" in record.getMessage():
+            metrics.inc("rest_rate_limited_total")
+
+class LoopWatchdog:
+    """Detects event loop stalls from a thread and samples the loop thread's stack while it is blocked.
+    
+    The loop keeps pushing a heartbeat deadline forward; once the watchdog sees the deadline
+    overrun by more than the threshold it captures the stack once and, when the loop
+    recovers, records the stall with the innermost known handler found in that stack.
+    """
+    
+    def __init__(self, threshold_ms: float):
+        self.threshold = threshold_ms / 1000
+        self.interval = self.threshold / 2
+        self.deadline = None
+        self.loop_thread = None
+        self.worst = []  # Min-heap of (seconds, sequence, record), size LOOP_WATCHDOG_KEEP
+        self.stalls = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.heartbeat_task = None
+    
+    def start(self):
+        self.loop_thread = threading.get_ident()
+        self.deadline = time.perf_counter() + self.interval
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+        self.thread = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.stopped.set()
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+    
+    async def heartbeat(self):
+        while True:
+            self.deadline = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+    
+    def watch(self):
+        stalled = None
+        while not self.stopped.wait(self.interval / 2):
+            deadline = self.deadline
+            if stalled is None:
+                if time.perf_counter() - deadline > self.threshold:
+                    stalled = (deadline, self.sample())
+            elif deadline != stalled[0]:
+                # The heartbeat ran again, so the deadline it set is one interval after recovery
+                self.record(deadline - self.interval - stalled[0], *stalled[1])
+                stalled = None
+    
+    def sample(self):
+        """Return (handler, stack lines) for whatever the loop thread is running right now"""
+        frame = sys._current_frames().get(self.loop_thread)
+        if frame is None:
+            return "unknown", []
+        handler = "unknown"
+        current = frame
+        while current is not None:
+            if current.f_code in HANDLER_CODES:
+                handler = HANDLER_CODES[current.f_code]
+                break
+            current = current.f_back
+        stack = [
+            f"{os.path.basename(entry.filename)}:{entry.lineno} in {entry.name}"
+            for entry in traceback.extract_stack(frame)
+        ]
+        return handler, stack
+    
+    def record(self, seconds: float, handler: str, stack: List[str]):
+        metrics.inc("loop_stalls_total", (("handler", handler),))
+        metrics.observe("loop_stall_seconds", seconds)
+        entry = {"seconds": round(seconds, 4), "handler": handler, "at": datetime.now().isoformat(), "stack": stack}
+        with self.lock:
+            self.stalls += 1
+            if len(self.worst) < LOOP_WATCHDOG_KEEP:
+                heapq.heappush(self.worst, (seconds, self.stalls, entry))
+            elif seconds > self.worst[0][0]:
+                heapq.heapreplace(self.worst, (seconds, self.stalls, entry))
+        print(f"Event loop blocked for {seconds * 1000:.0f} ms in {handler}")
+    
+    def offenders(self) -> List[dict]:
+        """Return the recorded stalls, worst first"""
+        with self.lock:
+            return [entry for _, _, entry in sorted(self.worst, reverse=True)]
+    
+    def write_profile(self, path: str = LOOP_PROFILE_FILE) -> int:
+        return write_json_file(path, {"threshold_ms": self.threshold * 1000, "stalls": self.stalls, "worst": self.offenders()})
+
+class PollRules:
+    """Voter eligibility rules compiled from a poll's role settings into sets keyed by role ID"""
+    
+    __slots__ = ('blocked', 'single_vote', 'multi_vote')
+    
+    def __init__(self, poll_data: dict):
+        self.blocked = frozenset(int(role_id) for role_id in poll_data['blocked_roles'])
+        self.single_vote = frozenset(int(role_id) for role_id in poll_data['single_vote_roles'])
+        self.multi_vote = {int(role_id): count for role_id, count in poll_data['multi_vote_config'].items()}
+    
+    def max_votes(self, role_ids) -> int:
+        """Return how many options a member with these roles may vote for (0 = not allowed)"""
+        # With single-vote roles configured, only members with a listed role may vote
+        eligible = not self.single_vote
+        limit = 1
+        for role_id in role_ids:
+            if role_id in self.blocked:
+                return 0
+            count = self.multi_vote.get(role_id)
+            if count is not None:
+                eligible = True
+                limit = max(limit, count)  # The most generous multi-vote role wins
+            elif role_id in self.single_vote:
+                eligible = True
+        return limit if eligible else 0
+
+def empty_tally(option_count: int) -> array:
+    """Create a zeroed per-option vote count array"""
+    return array('I', [0]) * option_count
+
+def record_vote(poll_data: dict, user_id: int, option_index: int) -> bool:
+    """Apply a vote to poll data, returning False if the user already voted for that option.
+    
+    votes is an array of counts per option and user_votes maps each user ID to
+    a bitmask of the options they voted for.
+    """
+    option_bit = 1 << option_index
+    voted = poll_data['user_votes'].get(user_id, 0)
+    if voted & option_bit:
+        return False
+    
+    poll_data['user_votes'][user_id] = voted | option_bit
+    poll_data['votes'][option_index] += 1
+    return True
+
+def poll_from_record(record: dict) -> dict:
+    """Convert a stored poll into its in-memory form, accepting the legacy dict/list vote format"""
+    option_count = len(record['titles'])
+    votes = record.get('votes') or {}
+    if isinstance(votes, dict):
+        votes = [votes.get(str(i), 0) for i in range(option_count)]
+    record['votes'] = array('I', votes)
+    
+    user_votes = {}
+    for user_id, voted in record.get('user_votes', {}).items():
+        if isinstance(voted, list):
+            voted = sum(1 << option_index for option_index in set(voted))
+        user_votes[int(user_id)] = voted
+    record['user_votes'] = user_votes
+    return record
+
+def poll_to_record(poll_data: dict) -> dict:
+    """Convert an in-memory poll into its JSON form: a list of counts and a bitmask per user"""
+    record = dict(poll_data)
+    record['votes'] = poll_data['votes'].tolist()
+    record['user_votes'] = {str(user_id): voted for user_id, voted in poll_data['user_votes'].items()}
+    return record
+
+def new_batch() -> dict:
+    """Create an empty batch of changes for StorageBackend.write_batch"""
+    return {"config": None, "polls": {}, "votes": [], "archive": {}, "previews": {}, "sticky_notes": {}}
+
+class StorageBackend:
+    """Interface for persisting role config, polls, previews and sticky notes.
+    
+    Backends are called from worker threads, one call at a time: once a guild's state is
+    loaded, every call goes through its PersistenceWriter (write_batch, read).
+    """
+    
+    bytes_written = 0  # Serialized bytes handed to the underlying files, for metrics
+    
+    def load_config(self) -> dict:
+        raise NotImplementedError
+    
+    def save_config(self, config: dict):
+        raise NotImplementedError
+    
+    def load_polls(self) -> dict:
+        raise NotImplementedError
+    
+    def load_index(self) -> dict:
+        """Return poll end_times, preview IDs, scheduled start times and sticky note channel IDs without loading the records"""
+        raise NotImplementedError
+    
+    def save_poll(self, poll_id: str, poll_data: dict):
+        """Persist a poll's settings; votes are persisted through record_vote"""
+        raise NotImplementedError
+    
+    def delete_poll(self, poll_id: str):
+        raise NotImplementedError
+    
+    def record_vote(self, poll_id: str, user_id: int, option_index: int):
+        """Persist a vote that has already been applied to the in-memory poll"""
+        raise NotImplementedError
+    
+    def archive_poll(self, poll_id: str, poll_data: dict):
+        """Store a closed poll, with its votes, closed_at and winners"""
+        raise NotImplementedError
+    
+    def load_archived_poll(self, poll_id: str) -> Optional[dict]:
+        raise NotImplementedError
+    
+    def archived_poll_ids(self) -> List[str]:
+        raise NotImplementedError
+    
+    def load_previews(self) -> dict:
+        raise NotImplementedError
+    
+    def preview_times(self) -> dict:
+        """Return each preview's last_used time (None if it was saved before that was recorded) without loading the records"""
+        raise NotImplementedError
+    
+    def load_preview(self, preview_id: str) -> Optional[dict]:
+        raise NotImplementedError
+    
+    def save_preview(self, preview_id: str, preview_data: dict):
+        raise NotImplementedError
+    
+    def delete_preview(self, preview_id: str):
+        raise NotImplementedError
+    
+    def load_sticky_notes(self) -> dict:
+        raise NotImplementedError
+    
+    def save_sticky_note(self, channel_id: str, sticky_data: dict):
+        raise NotImplementedError
+    
+    def delete_sticky_note(self, channel_id: str):
+        raise NotImplementedError
+    
+    def write_batch(self, batch: dict):
+        """Apply a batch of coalesced changes; a record of None means it was deleted"""
+        if batch["config"] is not None:
+            self.save_config(batch["config"])
+        
+        # Votes land between poll saves and deletes so a poll closed mid-batch drops them
+        for poll_id, poll_data in batch["polls"].items():
+            if poll_data is not None:
+                self.save_poll(poll_id, poll_data)
+        for poll_id, user_id, option_index in batch["votes"]:
+            self.record_vote(poll_id, user_id, option_index)
+        for poll_id, poll_data in batch["archive"].items():
+            self.archive_poll(poll_id, poll_data)
+        for poll_id, poll_data in batch["polls"].items():
+            if poll_data is None:
+                self.delete_poll(poll_id)
+        
+        for preview_id, preview_data in batch["previews"].items():
+            if preview_data is None:
+                self.delete_preview(preview_id)
+            else:
+                self.save_preview(preview_id, preview_data)
+        
+        for channel_id, sticky_data in batch["sticky_notes"].items():
+            if sticky_data is None:
+                self.delete_sticky_note(channel_id)
+            else:
+                self.save_sticky_note(channel_id, sticky_data)
+    
+    def close(self):
+        pass
+    
+    def export_json(self, directory: str):
+        """Write the stored state out as the JSON state files"""
+        os.makedirs(directory, exist_ok=True)
+        write_json_file(os.path.join(directory, CONFIG_FILE), self.load_config())
+        write_json_file(os.path.join(directory, POLLS_FILE), {
+            poll_id: poll_to_record(poll_data) for poll_id, poll_data in self.load_polls().items()
+        })
+        write_json_file(os.path.join(directory, PREVIEWS_FILE), self.load_previews())
+        write_json_file(os.path.join(directory, STICKY_NOTES_FILE), self.load_sticky_notes())
+        self.export_archive(directory)
+    
+    def export_archive(self, directory: str):
+        """Write the archived polls out as the JSON backend's archive files"""
+        target = JsonStorage(directory)
+        for poll_id in self.archived_poll_ids():
+            target.archive_poll(poll_id, self.load_archived_poll(poll_id))
+    
+    def import_json(self, directory: str):
+        """Load state from the JSON state files (including any vote journal and archive)"""
+        source = JsonStorage(directory)
+        try:
+            batch = new_batch()
+            batch["config"] = source.load_config()
+            batch["polls"] = source.load_polls()
+            batch["archive"] = {poll_id: source.load_archived_poll(poll_id) for poll_id in source.archived_poll_ids()}
+            batch["previews"] = source.load_previews()
+            batch["sticky_notes"] = source.load_sticky_notes()
+        finally:
+            source.close()
+        self.write_batch(batch)
+
+class JsonStorage(StorageBackend):
+    """Keeps each store in a JSON file, with votes journaled between poll snapshots.
+    
+    The storage holds its own copy of the state, so files can be rewritten from
+    the writer thread while the bot keeps mutating its live dicts.
+    """
+    
+    def __init__(self, directory: str = "."):
+        self.directory = directory
+        self.config = {"enabled_roles": {}}
+        self.polls = {}
+        self.previews = {}
+        self.sticky_notes = {}
+        self.vote_journal = None
+        self.journal_records = 0
+    
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+    
+    def write_file(self, filename: str, data, indent: Optional[int] = 2):
+        self.bytes_written += write_json_file(self.path(filename), data, indent)
+    
+    def load_config(self) -> dict:
+        self.config = read_json_file(self.path(CONFIG_FILE), {"enabled_roles": {}})
+        return copy.deepcopy(self.config)
+    
+    def save_config(self, config: dict):
+        self.config = config
+        self.write_file(CONFIG_FILE, config)
+    
+    def load_polls(self) -> dict:
+        self.polls = {
+            poll_id: poll_from_record(record)
+            for poll_id, record in read_json_file(self.path(POLLS_FILE), {}).items()
+        }
+        
+        # Replay votes recorded after the last snapshot, then compact them into it
+        if self.vote_journal:
+            self.vote_journal.close()
+        self.journal_records = self.replay_vote_journal()
+        self.vote_journal = open(self.path(VOTE_JOURNAL_FILE), 'a', encoding='utf-8')
+        if self.journal_records:
+            self.save_polls()
+        return copy.deepcopy(self.polls)
+    
+    def load_index(self) -> dict:
+        previews = read_json_file(self.path(PREVIEWS_FILE), {})
+        return {
+            "poll_deadlines": {
+                poll_id: record['end_time'] for poll_id, record in read_json_file(self.path(POLLS_FILE), {}).items()
+            },
+            "preview_ids": list(previews),
+            "poll_starts": {
+                preview_id: record['start']['time'] for preview_id, record in previews.items() if record.get('start')
+            },
+            "sticky_channels": list(read_json_file(self.path(STICKY_NOTES_FILE), {})),
+        }
+    
+    def save_polls(self):
+        """Save a snapshot of active polls to file and reset the vote journal"""
+        # Vote data dominates this file, so the snapshot is written without indentation
+        self.write_file(POLLS_FILE, {
+            poll_id: poll_to_record(poll_data) for poll_id, poll_data in self.polls.items()
+        }, indent=None)
+        
+        # Every journaled vote is now part of the snapshot
+        self.vote_journal.seek(0)
+        self.vote_journal.truncate()
+        self.journal_records = 0
+    
+    def replay_vote_journal(self) -> int:
+        """Apply journaled votes on top of the loaded snapshot and return the number of lines read"""
+        if not os.path.exists(self.path(VOTE_JOURNAL_FILE)):
+            return 0
+        
+        records = 0
+        with open(self.path(VOTE_JOURNAL_FILE), 'r', encoding='utf-8') as f:
+            for line in f:
+                # Torn lines count too, so the journal is compacted rather than appended to after one
+                records += 1
+                try:
+                    poll_id, user_id, option_index = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a crash mid-append
+                
+                poll_data = self.polls.get(poll_id)
+                if poll_data:
+                    record_vote(poll_data, int(user_id), option_index)
+        return records
+    
+    def save_poll(self, poll_id: str, poll_data: dict):
+        self.polls[poll_id] = poll_data
+        self.save_polls()
+    
+    def delete_poll(self, poll_id: str):
+        self.polls.pop(poll_id, None)
+        self.save_polls()
+    
+    def record_vote(self, poll_id: str, user_id: int, option_index: int):
+        self.append_votes([(poll_id, user_id, option_index)])
+    
+    def append_votes(self, votes: list):
+        """Persist votes by appending one compact record each to the journal"""
+        for poll_id, user_id, option_index in votes:
+            poll_data = self.polls.get(poll_id)
+            if poll_data:
+                record_vote(poll_data, user_id, option_index)
+        
+        # Periodically fold the journal into a fresh snapshot
+        if self.journal_records + len(votes) >= JOURNAL_COMPACT_THRESHOLD:
+            self.save_polls()
+            return
+        
+        records = ''.join(json.dumps(vote, separators=(',', ':')) + '\n' for vote in votes)
+        self.vote_journal.write(records)
+        self.bytes_written += len(records)
+        self.vote_journal.flush()
+        self.journal_records += len(votes)
+    
+    def archive_path(self, poll_id: str) -> Optional[str]:
+        # Poll IDs come from commands too, so only plain IDs map to a file
+        if not re.fullmatch(r'[\w-]+', poll_id):
+            return None
+        return os.path.join(self.directory, ARCHIVE_DIRECTORY, f"{poll_id}.json.gz")
+    
+    def archive_poll(self, poll_id: str, poll_data: dict):
+        path = self.archive_path(poll_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", 'wb') as f:
+            with gzip.GzipFile(fileobj=f, mode='wb') as archive:
+                archive.write(json.dumps(poll_to_record(poll_data), separators=(',', ':')).encode())
+            f.flush()
+            os.fsync(f.fileno())
+            self.bytes_written += f.tell()
+        os.replace(path + ".tmp", path)
+    
+    def load_archived_poll(self, poll_id: str) -> Optional[dict]:
+        path = self.archive_path(poll_id)
+        if path is None or not os.path.exists(path):
+            return None
+        with gzip.open(path, 'rb') as archive:
+            return poll_from_record(json.load(archive))
+    
+    def archived_poll_ids(self) -> List[str]:
+        directory = os.path.join(self.directory, ARCHIVE_DIRECTORY)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len(".json.gz")] for name in os.listdir(directory) if name.endswith(".json.gz"))
+    
+    def load_previews(self) -> dict:
+        self.previews = read_json_file(self.path(PREVIEWS_FILE), {})
+        return copy.deepcopy(self.previews)
+    
+    def preview_times(self) -> dict:
+        # The whole file is rewritten from the mirror on every save, so this reads it all anyway:
+        # with JSON, previews stay in memory here and only the copies handed out are lazy
+        self.previews = read_json_file(self.path(PREVIEWS_FILE), {})
+        return {preview_id: record.get('last_used') for preview_id, record in self.previews.items()}
+    
+    def load_preview(self, preview_id: str) -> Optional[dict]:
+        return copy.deepcopy(self.previews.get(preview_id))
+    
+    def save_preview(self, preview_id: str, preview_data: dict):
+        self.previews[preview_id] = preview_data
+        self.write_file(PREVIEWS_FILE, self.previews)
+    
+    def delete_preview(self, preview_id: str):
+        self.previews.pop(preview_id, None)
+        self.write_file(PREVIEWS_FILE, self.previews)
+    
+    def load_sticky_notes(self) -> dict:
+        self.sticky_notes = read_json_file(self.path(STICKY_NOTES_FILE), {})
+        return copy.deepcopy(self.sticky_notes)
+    
+    def save_sticky_note(self, channel_id: str, sticky_data: dict):
+        self.sticky_notes[channel_id] = sticky_data
+        self.write_file(STICKY_NOTES_FILE, self.sticky_notes)
+    
+    def delete_sticky_note(self, channel_id: str):
+        self.sticky_notes.pop(channel_id, None)
+        self.write_file(STICKY_NOTES_FILE, self.sticky_notes)
+    
+    def write_batch(self, batch: dict):
+        """Apply a batch, rewriting each changed file once"""
+        if batch["config"] is not None:
+            self.save_config(batch["config"])
+        
+        if batch["polls"]:
+            for poll_id, poll_data in batch["polls"].items():
+                if poll_data is None:
+                    self.polls.pop(poll_id, None)
+                else:
+                    self.polls[poll_id] = poll_data
+            for poll_id, user_id, option_index in batch["votes"]:
+                if poll_id in self.polls:
+                    record_vote(self.polls[poll_id], user_id, option_index)
+            self.save_polls()
+        elif batch["votes"]:
+            self.append_votes(batch["votes"])
+        
+        for poll_id, poll_data in batch["archive"].items():
+            self.archive_poll(poll_id, poll_data)
+        
+        if batch["previews"]:
+            for preview_id, preview_data in batch["previews"].items():
+                if preview_data is None:
+                    self.previews.pop(preview_id, None)
+                else:
+                    self.previews[preview_id] = preview_data
+            self.write_file(PREVIEWS_FILE, self.previews)
+        
+        if batch["sticky_notes"]:
+            for channel_id, sticky_data in batch["sticky_notes"].items():
+                if sticky_data is None:
+                    self.sticky_notes.pop(channel_id, None)
+                else:
+                    self.sticky_notes[channel_id] = sticky_data
+            self.write_file(STICKY_NOTES_FILE, self.sticky_notes)
+    
+    def export_json(self, directory: str):
+        """Write the current state out as JSON state files"""
+        os.makedirs(directory, exist_ok=True)
+        write_json_file(os.path.join(directory, CONFIG_FILE), self.config)
+        write_json_file(os.path.join(directory, POLLS_FILE), {
+            poll_id: poll_to_record(poll_data) for poll_id, poll_data in self.polls.items()
+        })
+        write_json_file(os.path.join(directory, PREVIEWS_FILE), self.previews)
+        write_json_file(os.path.join(directory, STICKY_NOTES_FILE), self.sticky_notes)
+        if os.path.abspath(directory) != os.path.abspath(self.directory):
+            self.export_archive(directory)
+    
+    def close(self):
+        if self.vote_journal:
+            self.vote_journal.close()
+            self.vote_journal = None
+
+class SQLiteStorage(StorageBackend):
+    """Keeps state in a WAL-mode SQLite database with one row per vote, preview and sticky note.
+    
+    Single-record methods leave the transaction open; write_batch commits a whole batch at once.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS role_permissions (
+            command TEXT NOT NULL,
+            role_id INTEGER NOT NULL,
+            PRIMARY KEY (command, role_id)
+        );
+        CREATE TABLE IF NOT EXISTS polls (
+            poll_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS poll_votes (
+            poll_id TEXT NOT NULL,
+            option_index INTEGER NOT NULL,
+            votes INTEGER NOT NULL,
+            PRIMARY KEY (poll_id, option_index)
+        );
+        CREATE TABLE IF NOT EXISTS user_votes (
+            poll_id TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            option_index INTEGER NOT NULL,
+            PRIMARY KEY (poll_id, user_id, option_index)
+        );
+        CREATE TABLE IF NOT EXISTS archived_polls (
+            poll_id TEXT PRIMARY KEY,
+            closed_at TEXT NOT NULL,
+            data BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS previews (
+            preview_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sticky_notes (
+            channel_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+    
+    def __init__(self, path: str = DATABASE_FILE):
+        directory = os.path.dirname(path) or "."
+        is_new = not os.path.exists(path)
+        # Writes come from the persistence writer's worker threads, one batch at a time
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        
+        # Seed a fresh database from existing JSON state files
+        if is_new and any(os.path.exists(os.path.join(directory, f)) for f in (CONFIG_FILE, POLLS_FILE, PREVIEWS_FILE, STICKY_NOTES_FILE)):
+            self.import_json(directory)
+            print(f"Imported JSON state files into {path}")
+    
+    def encode(self, data: dict) -> str:
+        payload = json.dumps(data)
+        self.bytes_written += len(payload)
+        return payload
+    
+    def load_config(self) -> dict:
+        enabled_roles = {}
+        for command, role_id in self.db.execute("SELECT command, role_id FROM role_permissions ORDER BY rowid"):
+            enabled_roles.setdefault(command, []).append(role_id)
+        return {"enabled_roles": enabled_roles}
+    
+    def save_config(self, config: dict):
+        # Role config is a handful of rows, so it is simply replaced
+        self.db.execute("DELETE FROM role_permissions")
+        self.db.executemany(
+            "INSERT OR IGNORE INTO role_permissions (command, role_id) VALUES (?, ?)",
+            [(command, role_id) for command, role_ids in config["enabled_roles"].items() for role_id in role_ids]
+        )
+    
+    def load_polls(self) -> dict:
+        polls = {}
+        for poll_id, data in self.db.execute("SELECT poll_id, data FROM polls"):
+            poll_data = json.loads(data)
+            poll_data['votes'] = empty_tally(len(poll_data['titles']))
+            poll_data['user_votes'] = {}
+            polls[poll_id] = poll_data
+        
+        for poll_id, option_index, votes in self.db.execute("SELECT poll_id, option_index, votes FROM poll_votes"):
+            if poll_id in polls:
+                polls[poll_id]['votes'][option_index] = votes
+        
+        for poll_id, user_id, option_index in self.db.execute("SELECT poll_id, user_id, option_index FROM user_votes"):
+            if poll_id in polls:
+                user_votes = polls[poll_id]['user_votes']
+                user_id = int(user_id)
+                user_votes[user_id] = user_votes.get(user_id, 0) | (1 << option_index)
+        return polls
+    
+    def load_index(self) -> dict:
+        return {
+            "poll_deadlines": dict(self.db.execute("SELECT poll_id, json_extract(data, '$.end_time') FROM polls")),
+            "preview_ids": [preview_id for preview_id, in self.db.execute("SELECT preview_id FROM previews")],
+            "poll_starts": dict(self.db.execute(
+                "SELECT preview_id, json_extract(data, '$.start.time') FROM previews WHERE json_extract(data, '$.start') IS NOT NULL"
+            )),
+            "sticky_channels": [channel_id for channel_id, in self.db.execute("SELECT channel_id FROM sticky_notes")],
+        }
+    
+    def save_poll(self, poll_id: str, poll_data: dict):
+        settings = {key: value for key, value in poll_data.items() if key not in ('votes', 'user_votes')}
+        self.db.execute(
+            "INSERT INTO polls (poll_id, data) VALUES (?, ?) ON CONFLICT(poll_id) DO UPDATE SET data = excluded.data",
+            (poll_id, self.encode(settings))
+        )
+    
+    def delete_poll(self, poll_id: str):
+        self.db.execute("DELETE FROM polls WHERE poll_id = ?", (poll_id,))
+        self.db.execute("DELETE FROM poll_votes WHERE poll_id = ?", (poll_id,))
+        self.db.execute("DELETE FROM user_votes WHERE poll_id = ?", (poll_id,))
+    
+    def record_vote(self, poll_id: str, user_id: int, option_index: int):
+        cursor = self.db.execute(
+            "INSERT OR IGNORE INTO user_votes (poll_id, user_id, option_index) VALUES (?, ?, ?)",
+            (poll_id, user_id, option_index)
+        )
+        if cursor.rowcount:
+            self.db.execute(
+                "INSERT INTO poll_votes (poll_id, option_index, votes) VALUES (?, ?, 1) "
+                "ON CONFLICT(poll_id, option_index) DO UPDATE SET votes = votes + 1",
+                (poll_id, option_index)
+            )
+    
+    def archive_poll(self, poll_id: str, poll_data: dict):
+        # Archives are written once and rarely read, so they are stored compressed
+        payload = zlib.compress(json.dumps(poll_to_record(poll_data), separators=(',', ':')).encode())
+        self.bytes_written += len(payload)
+        self.db.execute(
+            "INSERT OR REPLACE INTO archived_polls (poll_id, closed_at, data) VALUES (?, ?, ?)",
+            (poll_id, poll_data.get('closed_at', ''), payload)
+        )
+    
+    def load_archived_poll(self, poll_id: str) -> Optional[dict]:
+        row = self.db.execute("SELECT data FROM archived_polls WHERE poll_id = ?", (poll_id,)).fetchone()
+        return poll_from_record(json.loads(zlib.decompress(row[0]))) if row else None
+    
+    def archived_poll_ids(self) -> List[str]:
+        return [poll_id for poll_id, in self.db.execute("SELECT poll_id FROM archived_polls ORDER BY closed_at")]
+    
+    def load_previews(self) -> dict:
+        return {preview_id: json.loads(data) for preview_id, data in self.db.execute("SELECT preview_id, data FROM previews")}
+    
+    def preview_times(self) -> dict:
+        return dict(self.db.execute("SELECT preview_id, json_extract(data, '$.last_used') FROM previews"))
+    
+    def load_preview(self, preview_id: str) -> Optional[dict]:
+        row = self.db.execute("SELECT data FROM previews WHERE preview_id = ?", (preview_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def save_preview(self, preview_id: str, preview_data: dict):
+        self.db.execute(
+            "INSERT INTO previews (preview_id, data) VALUES (?, ?) ON CONFLICT(preview_id) DO UPDATE SET data = excluded.data",
+            (preview_id, self.encode(preview_data))
+        )
+    
+    def delete_preview(self, preview_id: str):
+        self.db.execute("DELETE FROM previews WHERE preview_id = ?", (preview_id,))
+    
+    def load_sticky_notes(self) -> dict:
+        return {channel_id: json.loads(data) for channel_id, data in self.db.execute("SELECT channel_id, data FROM sticky_notes")}
+    
+    def save_sticky_note(self, channel_id: str, sticky_data: dict):
+        self.db.execute(
+            "INSERT INTO sticky_notes (channel_id, data) VALUES (?, ?) ON CONFLICT(channel_id) DO UPDATE SET data = excluded.data",
+            (channel_id, self.encode(sticky_data))
+        )
+    
+    def delete_sticky_note(self, channel_id: str):
+        self.db.execute("DELETE FROM sticky_notes WHERE channel_id = ?", (channel_id,))
+    
+    def write_batch(self, batch: dict):
+        """Apply a batch in a single transaction"""
+        with self.db:
+            super().write_batch(batch)
+    
+    def import_json(self, directory: str):
+        """Replace the database contents with the JSON state files"""
+        source = JsonStorage(directory)
+        try:
+            config = source.load_config()
+            polls = source.load_polls()
+            archive = {poll_id: source.load_archived_poll(poll_id) for poll_id in source.archived_poll_ids()}
+            previews = source.load_previews()
+            sticky_notes = source.load_sticky_notes()
+        finally:
+            source.close()
+        
+        with self.db:
+            for table in ("polls", "poll_votes", "user_votes", "archived_polls", "previews", "sticky_notes"):
+                self.db.execute(f"DELETE FROM {table}")
+            
+            self.save_config(config)
+            for poll_id, poll_data in polls.items():
+                self.save_poll(poll_id, poll_data)
+                for user_id, voted in poll_data['user_votes'].items():
+                    for option_index in range(len(poll_data['titles'])):
+                        if voted >> option_index & 1:
+                            self.record_vote(poll_id, user_id, option_index)
+            for poll_id, poll_data in archive.items():
+                self.archive_poll(poll_id, poll_data)
+            for preview_id, preview_data in previews.items():
+                self.save_preview(preview_id, preview_data)
+            for channel_id, sticky_data in sticky_notes.items():
+                self.save_sticky_note(channel_id, sticky_data)
+    
+    def close(self):
+        self.db.close()
+
+def create_storage(directory: str = ".") -> StorageBackend:
+    """Create the storage backend selected by STORAGE_BACKEND for a state directory"""
+    if STORAGE_BACKEND == 'sqlite':
+        return SQLiteStorage(os.path.join(directory, DATABASE_FILE))
+    return JsonStorage(directory)
+
+def guild_directory(guild_id: int) -> str:
+    """Return (and create) the directory holding a guild's state"""
+    directory = os.path.join(DATA_DIRECTORY, str(guild_id))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def stored_guild_ids() -> List[int]:
+    """List the guilds that have a state directory"""
+    if not os.path.isdir(DATA_DIRECTORY):
+        return []
+    return [int(name) for name in os.listdir(DATA_DIRECTORY) if name.isdigit()]
+
+def migrate_legacy_state():
+    """Move single-guild state files from the working directory into GUILD_ID's data directory"""
+    legacy_files = [
+        name for name in (
+            CONFIG_FILE, POLLS_FILE, PREVIEWS_FILE, STICKY_NOTES_FILE, VOTE_JOURNAL_FILE,
+            DATABASE_FILE, DATABASE_FILE + "-wal", DATABASE_FILE + "-shm"
+        )
+        if os.path.exists(name)
+    ]
+    if not legacy_files:
+        return
+    
+    directory = os.path.join(DATA_DIRECTORY, str(GUILD_ID))
+    if os.path.isdir(directory) and os.listdir(directory):
+        print(f"⚠️ Legacy state files left in place, {directory} already has state")
+        return
+    
+    os.makedirs(directory, exist_ok=True)
+    for name in legacy_files:
+        os.replace(name, os.path.join(directory, name))
+    print(f"Moved legacy state files into {directory}")
+
+def convert_state(command: str, directory: str) -> int:
+    """Export every guild's state as JSON state files under directory ("export-json"), or import them back ("import-json").
+    
+    Returns the number of guilds converted.
+    """
+    if command == "export-json":
+        guild_ids = stored_guild_ids()
+    else:
+        guild_ids = [int(name) for name in os.listdir(directory) if name.isdigit()]
+    
+    for guild_id in guild_ids:
+        storage = create_storage(guild_directory(guild_id))
+        try:
+            # JsonStorage exports from its mirrors and writes through its vote journal, so both must be loaded first
+            storage.load_config()
+            storage.load_polls()
+            storage.load_previews()
+            storage.load_sticky_notes()
+            if command == "export-json":
+                storage.export_json(os.path.join(directory, str(guild_id)))
+            else:
+                storage.import_json(os.path.join(directory, str(guild_id)))
+        finally:
+            storage.close()
+    return len(guild_ids)
+
+class PersistenceWriter:
+    """Background task that coalesces state changes and writes them off the event loop.
+    
+    Handlers only mark records dirty (or queue a vote); the writer snapshots the
+    dirty records after a short debounce and hands the batch to a worker thread.
+    """
+    
+    # Store name -> attribute holding that store's live state
+    STORES = {
+        "config": "role_config",
+        "polls": "active_polls",
+        "previews": "poll_previews",
+        "sticky_notes": "sticky_notes",
+    }
+    
+    def __init__(self, storage: StorageBackend, state):
+        self.storage = storage
+        self.state = state
+        self.queue = asyncio.Queue()
+        self.dirty = {store: set() for store in self.STORES}
+        self.votes = []
+        self.archived = {}  # poll_id -> closed poll, handed over whole since nothing mutates it any more
+        self.pending = 0
+        self.lock = asyncio.Lock()
+        self.write_future = None  # Storage write running in a worker thread, with its batch
+        self.write_batch = None
+        self.storage_lock = threading.Lock()  # Held by the worker thread running a storage call
+        self.task = None
+    
+    @property
+    def writing(self) -> bool:
+        return self.write_future is not None and not self.write_future.done()
+    
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+    
+    def idle(self) -> bool:
+        """True when every change has been written and no write is in progress"""
+        return self.pending == 0 and self.queue.empty() and not self.writing
+    
+    def stop(self):
+        """Stop an idle writer without a final flush"""
+        if self.task:
+            self.task.cancel()
+            self.task = None
+    
+    def locked(self, func, *args):
+        """Call a storage method while no other thread is using the storage (blocking; run it in a thread)"""
+        with self.storage_lock:
+            return func(*args)
+    
+    async def read(self, func, *args):
+        """Run a storage read in a worker thread, never at the same time as a write"""
+        return await asyncio.to_thread(self.locked, func, *args)
+    
+    def mark_dirty(self, store: str, key: Optional[str] = None):
+        """Schedule a record (or the whole config) to be written"""
+        self.queue.put_nowait((store, key))
+    
+    def add_vote(self, poll_id: str, user_id: int, option_index: int):
+        """Schedule a single vote to be written"""
+        self.queue.put_nowait(("votes", (poll_id, user_id, option_index)))
+    
+    def archive(self, poll_id: str, poll_data: dict):
+        """Schedule a closed poll to be written to the archive"""
+        self.queue.put_nowait(("archive", (poll_id, poll_data)))
+    
+    def collect(self, item):
+        store, key = item
+        if store == "votes":
+            self.votes.append(key)
+        elif store == "archive":
+            self.archived[key[0]] = key[1]
+        else:
+            self.dirty[store].add(key)
+        self.pending += 1
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Changes restored from a failed write are retried without waiting for new ones
+            if not self.pending:
+                self.collect(await self.queue.get())
+            
+            # Keep coalescing until things go quiet or the batch is big enough
+            deadline = loop.time() + PERSIST_DEBOUNCE_SECONDS
+            while self.pending < PERSIST_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    self.collect(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error saving state, retrying in {PERSIST_RETRY_SECONDS:g}s: {e}")
+                metrics.inc("persist_failures_total")
+                await asyncio.sleep(PERSIST_RETRY_SECONDS)
+    
+    def take_batch(self) -> dict:
+        """Snapshot every dirty record into a batch and reset the pending changes"""
+        while not self.queue.empty():
+            self.collect(self.queue.get_nowait())
+        
+        batch = new_batch()
+        if self.dirty["config"]:
+            batch["config"] = copy.deepcopy(self.state.role_config)
+        for store in ("polls", "previews", "sticky_notes"):
+            records = getattr(self.state, self.STORES[store])
+            for key in self.dirty[store]:
+                record = records.get(key)
+                batch[store][key] = copy.deepcopy(record) if record is not None else None
+        batch["votes"] = self.votes
+        batch["archive"] = self.archived
+        
+        self.dirty = {store: set() for store in self.STORES}
+        self.votes = []
+        self.archived = {}
+        self.pending = 0
+        return batch
+    
+    def restore_batch(self, batch: dict):
+        """Put the changes of a failed write back so the next flush retries them.
+        
+        Records are re-marked dirty rather than re-queued as written, so the retry
+        snapshots their current state. Replaying votes is harmless: both backends
+        ignore a vote they already hold.
+        """
+        if batch["config"] is not None:
+            self.dirty["config"].add(None)
+        for store in ("polls", "previews", "sticky_notes"):
+            self.dirty[store].update(batch[store])
+        self.votes = batch["votes"] + self.votes
+        self.archived = {**batch["archive"], **self.archived}
+        self.pending += (batch["config"] is not None) + len(batch["votes"]) + len(batch["archive"]) + sum(
+            len(batch[store]) for store in ("polls", "previews", "sticky_notes"))
+    
+    async def wait_for_write(self):
+        """Wait for a write left running by a cancelled flush, restoring its batch if it failed"""
+        future, batch = self.write_future, self.write_batch
+        if future is None:
+            return
+        try:
+            await future
+        except Exception as e:
+            print(f"Error saving state: {e}")
+            if self.write_future is future:
+                self.restore_batch(batch)
+        finally:
+            if self.write_future is future:
+                self.write_future = self.write_batch = None
+    
+    async def flush(self):
+        """Write all pending changes"""
+        async with self.lock:
+            await self.wait_for_write()
+            batch = self.take_batch()
+            if batch["config"] is None and not any(batch[store] for store in ("polls", "votes", "archive", "previews", "sticky_notes")):
+                return
+            
+            bytes_before = self.storage.bytes_written
+            started = time.perf_counter()
+            # The thread can't be interrupted, so cancelling a flush leaves the write
+            # running; close() and the next flush wait for it through write_future
+            self.write_batch = batch
+            self.write_future = asyncio.ensure_future(asyncio.to_thread(self.locked, self.storage.write_batch, batch))
+            try:
+                await asyncio.shield(self.write_future)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.restore_batch(batch)
+                raise
+            finally:
+                if self.write_future is not None and self.write_future.done():
+                    self.write_future = self.write_batch = None
+            metrics.observe("persist_flush_seconds", time.perf_counter() - started)
+            metrics.inc("persist_bytes_total", value=self.storage.bytes_written - bytes_before)
+            metrics.inc("persist_votes_total", value=len(batch["votes"]))
+    
+    async def close(self):
+        """Stop the writer, force a final flush and close the storage"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        
+        # Let a write that is already running finish before writing the rest
+        async with self.lock:
+            await self.wait_for_write()
+            batch = self.take_batch()
+            try:
+                await asyncio.to_thread(self.locked, self.storage.write_batch, batch)
+            finally:
+                await asyncio.to_thread(self.locked, self.storage.close)
+
+class PollVoteQueue:
+    """Serializes the votes of each poll and applies them in batches.
+    
+    Clicks are queued per poll and applied together on the next loop iteration,
+    re-checking each voter's limit against the poll's current state. Closing a poll
+    applies what is already queued and turns away anything that arrives later, so the
+    results never change underneath close_poll. Unrelated polls never wait on each other.
+    """
+    
+    def __init__(self, state):
+        self.state = state
+        self.pending = {}  # poll_id -> [(user_id, option_index, max_votes, future)]
+        self.closed = set()
+    
+    def submit(self, poll_id: str, user_id: int, option_index: int, max_votes: int) -> asyncio.Future:
+        """Queue a vote; the future resolves to recorded, duplicate, limit or closed"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if poll_id in self.closed or poll_id not in self.state.active_polls:
+            future.set_result("closed")
+            return future
+        
+        batch = self.pending.get(poll_id)
+        if batch is None:
+            batch = self.pending[poll_id] = []
+            loop.call_soon(self.apply, poll_id)
+        batch.append((user_id, option_index, max_votes, future))
+        return future
+    
+    def apply(self, poll_id: str):
+        """Apply every queued vote for a poll in one pass"""
+        batch = self.pending.pop(poll_id, None)
+        if not batch:
+            return
+        
+        poll_data = self.state.active_polls.get(poll_id)
+        for user_id, option_index, max_votes, future in batch:
+            if poll_data is None:
+                result = "closed"
+            else:
+                voted = poll_data['user_votes'].get(user_id, 0)
+                if voted.bit_count() >= max_votes:
+                    result = "limit"
+                elif voted >> option_index & 1:
+                    result = "duplicate"
+                else:
+                    record_vote(poll_data, user_id, option_index)
+                    self.state.append_vote(poll_id, user_id, option_index)
+                    result = "recorded"
+            
+            # A cancelled interaction leaves its future done; the vote itself still stands
+            if not future.done():
+                future.set_result(result)
+        metrics.inc("vote_batches_total")
+    
+    def close(self, poll_id: str) -> bool:
+        """Apply queued votes and stop accepting new ones, returning False if the poll is already closing"""
+        if poll_id in self.closed:
+            return False
+        self.apply(poll_id)
+        self.closed.add(poll_id)
+        return True
+    
+    def forget(self, poll_id: str):
+        self.pending.pop(poll_id, None)
+        self.closed.discard(poll_id)
+
+class DeadlineScheduler:
+    """Runs a job for every guild at its deadline from a single task over a min-heap of (deadline, guild_id, job_id).
+    
+    Rescheduled or cancelled jobs leave stale heap entries behind, which are
+    skipped when they reach the top. Jobs that are due together are run
+    batch_size at a time.
+    """
+    
+    batch_size = 10
+    
+    def __init__(self, bot):
+        self.bot = bot
+        self.heap = []
+        self.deadlines = {}  # job_id -> timestamp of its live heap entry
+        self.wakeup = asyncio.Event()
+        self.task = None
+    
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+    
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+    
+    def schedule(self, guild_id: int, job_id: str, when: str):
+        """Schedule a job to run at an ISO-format time"""
+        deadline = datetime.fromisoformat(when).timestamp()
+        self.deadlines[job_id] = deadline
+        heapq.heappush(self.heap, (deadline, guild_id, job_id))
+        
+        # Wake the task if this is now the earliest deadline
+        if self.heap[0] == (deadline, guild_id, job_id):
+            self.wakeup.set()
+    
+    def cancel(self, job_id: str):
+        self.deadlines.pop(job_id, None)
+    
+    def pop_due(self, now: float) -> List[tuple]:
+        """Pop every (guild_id, job_id) whose deadline has passed"""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, guild_id, job_id = heapq.heappop(self.heap)
+            if self.deadlines.get(job_id) == deadline:
+                del self.deadlines[job_id]
+                due.append((guild_id, job_id))
+        return due
+    
+    async def run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            self.wakeup.clear()
+            
+            # Drop stale entries so the top of the heap is a live deadline
+            while self.heap and self.deadlines.get(self.heap[0][2]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            
+            if not self.heap:
+                await self.wakeup.wait()
+                continue
+            
+            delay = self.heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            # Run everything that is due, a batch at a time
+            due = self.pop_due(time.time())
+            for i in range(0, len(due), self.batch_size):
+                await asyncio.gather(*(self.run_job(guild_id, job_id) for guild_id, job_id in due[i:i + self.batch_size]))
+    
+    async def run_job(self, guild_id: int, job_id: str):
+        raise NotImplementedError
+
+class PollScheduler(DeadlineScheduler):
+    """Closes polls at their end_time"""
+    
+    batch_size = POLL_CLOSE_BATCH_SIZE
+    
+    async def run_job(self, guild_id: int, poll_id: str):
+        try:
+            await close_poll(await self.bot.guild_state(guild_id), poll_id)
+        except Exception as e:
+            print(f"Error closing poll {poll_id}: {e}")
+
+class PollStartScheduler(DeadlineScheduler):
+    """Starts scheduled polls at their start time; the schedule is stored with the preview, so it survives restarts"""
+    
+    batch_size = POLL_START_CONCURRENCY
+    
+    async def run_job(self, guild_id: int, preview_id: str):
+        try:
+            await start_scheduled_poll(await self.bot.guild_state(guild_id), preview_id)
+        except Exception as e:
+            print(f"Error starting scheduled poll {preview_id}: {e}")
+
+class RestAction:
+    """A queued outbound REST call"""
+    
+    __slots__ = ('kind', 'bucket', 'call', 'key', 'future', 'queued', 'attempts')
+    
+    def __init__(self, kind: str, bucket, call, key: Optional[tuple], future: asyncio.Future):
+        self.kind = kind
+        self.bucket = bucket
+        self.call = call
+        self.key = key
+        self.future = future
+        self.queued = time.perf_counter()
+        self.attempts = 0
+
+class RestQueue:
+    """Central queue for the bot's own REST calls (message sends, edits and deletes).
+    
+    Actions run in REST_PRIORITIES order with at most one in flight per bucket (the
+    channel, which is what Discord rate limits message routes by), so a busy channel
+    never ties up every worker. A 429 or server error holds the bucket back for
+    retry_after and requeues the action. Queuing an action with the key of one that
+    has not started yet drops the older one, whose future resolves to None.
+    Interaction responses never go through here; they must answer within 3 seconds.
+    """
+    
+    def __init__(self, workers: int = REST_QUEUE_WORKERS):
+        self.workers = workers
+        self.buckets = {}  # bucket -> heap of (priority, sequence, action); superseded actions are skipped when popped
+        self.ready = []  # (priority, sequence, bucket) of each free bucket's most urgent action
+        self.ready_keys = {}  # bucket -> (priority, sequence) of its live entry in ready; older entries are stale
+        self.sequence = 0
+        self.keyed = {}  # key -> queued action it would supersede
+        self.busy = set()  # buckets with an action in flight
+        self.held = {}  # bucket -> loop time its rate limit resets
+        self.holds = []  # (loop time, bucket) heap of held buckets
+        self.wakeup = asyncio.Event()
+        self.tasks = []
+    
+    @property
+    def depth(self) -> int:
+        return sum(1 for queue in self.buckets.values() for _, _, action in queue if not action.future.done())
+    
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self.run()) for _ in range(self.workers)]
+    
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+    
+    def submit(self, kind: str, bucket, call, key: Optional[tuple] = None) -> asyncio.Future:
+        """Queue call() (a coroutine function) and return a future for its result"""
+        if not self.tasks:
+            # Not running (tools, or before setup_hook): call straight through
+            return asyncio.ensure_future(call())
+        
+        future = asyncio.get_running_loop().create_future()
+        action = RestAction(kind, bucket, call, key, future)
+        if key is not None:
+            previous = self.keyed.get(key)
+            if previous is not None and not previous.future.done():
+                previous.future.set_result(None)
+                metrics.inc("rest_actions_total", (("kind", previous.kind), ("result", "superseded")))
+            self.keyed[key] = action
+        self.push(action)
+        return future
+    
+    def push(self, action: RestAction):
+        self.sequence += 1
+        heapq.heappush(self.buckets.setdefault(action.bucket, []), (REST_PRIORITIES[action.kind], self.sequence, action))
+        if action.bucket not in self.busy and action.bucket not in self.held:
+            self.mark_ready(action.bucket)
+    
+    def mark_ready(self, bucket):
+        """Offer a free bucket's most urgent action to the workers"""
+        queue = self.buckets.get(bucket)
+        while queue and queue[0][2].future.done():
+            heapq.heappop(queue)  # Superseded or cancelled
+        if not queue:
+            self.buckets.pop(bucket, None)
+            self.ready_keys.pop(bucket, None)
+            return
+        key = queue[0][:2]
+        if self.ready_keys.get(bucket) != key:
+            self.ready_keys[bucket] = key
+            heapq.heappush(self.ready, (*key, bucket))
+            self.wakeup.set()
+    
+    def take(self, now: float):
+        """Pop the most urgent action whose bucket is free; returns (action, seconds until a held bucket frees).
+        
+        Busy and held buckets are not in the ready heap, so their actions are never looked at.
+        """
+        while self.holds and self.holds[0][0] <= now:
+            _, bucket = heapq.heappop(self.holds)
+            if bucket in self.held and self.held[bucket] <= now:
+                self.held.pop(bucket, None)
+                self.mark_ready(bucket)
+        
+        while self.ready:
+            priority, sequence, bucket = heapq.heappop(self.ready)
+            if self.ready_keys.get(bucket) != (priority, sequence):
+                continue  # A more urgent action was queued for this bucket since
+            del self.ready_keys[bucket]
+            queue = self.buckets[bucket]
+            if queue[0][2].future.done():
+                self.mark_ready(bucket)  # Superseded since it was offered: offer the next one instead
+                continue
+            action = heapq.heappop(queue)[2]
+            if not queue:
+                del self.buckets[bucket]
+            return action, None
+        return None, (self.holds[0][0] - now if self.holds else None)
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            action, wait = self.take(loop.time())
+            if action is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            self.busy.add(action.bucket)
+            try:
+                await self.execute(action, loop)
+            finally:
+                self.busy.discard(action.bucket)
+                if action.bucket in self.held:
+                    self.wakeup.set()  # Idle workers recompute how long to wait
+                else:
+                    self.mark_ready(action.bucket)
+    
+    async def execute(self, action: RestAction, loop: asyncio.AbstractEventLoop):
+        if action.key is not None and self.keyed.get(action.key) is action:
+            del self.keyed[action.key]  # Started actions can no longer be superseded
+        if action.attempts == 0:
+            metrics.observe("rest_queue_wait_seconds", time.perf_counter() - action.queued, (("kind", action.kind),))
+        
+        action.attempts += 1
+        retry_after = None
+        try:
+            result = await action.call()
+        except discord.RateLimited as e:
+            retry_after = e.retry_after
+        except discord.HTTPException as e:
+            if e.status == 429:
+                retry_after = float(e.response.headers.get('Retry-After', 1))
+            elif e.status >= 500 and action.attempts < REST_MAX_ATTEMPTS:
+                retry_after = 2.0 ** action.attempts
+            else:
+                metrics.inc("rest_actions_total", (("kind", action.kind), ("result", "failed")))
+                if not action.future.done():
+                    action.future.set_exception(e)
+                return
+        except Exception as e:
+            metrics.inc("rest_actions_total", (("kind", action.kind), ("result", "failed")))
+            if not action.future.done():
+                action.future.set_exception(e)
+            return
+        
+        if retry_after is None:
+            metrics.inc("rest_actions_total", (("kind", action.kind), ("result", "ok")))
+            if not action.future.done():
+                action.future.set_result(result)
+            return
+        
+        # Hold the bucket and try again, unless a newer action has replaced this one meanwhile
+        self.held[action.bucket] = loop.time() + retry_after
+        heapq.heappush(self.holds, (self.held[action.bucket], action.bucket))
+        metrics.inc("rest_actions_total", (("kind", action.kind), ("result", "retried")))
+        if action.key is not None and action.key in self.keyed:
+            action.future.set_result(None)
+            metrics.inc("rest_actions_total", (("kind", action.kind), ("result", "superseded")))
+        elif not action.future.done():
+            if action.key is not None:
+                self.keyed[action.key] = action  # Queued again, so a newer action with its key can replace it
+            self.push(action)
+    
+    def enqueue(self, kind: str, bucket, call, description: str, key: Optional[tuple] = None):
+        """Queue an action nobody waits on; failures other than NotFound are logged"""
+        self.submit(kind, bucket, call, key).add_done_callback(functools.partial(self.log_failure, description))
+    
+    @staticmethod
+    def log_failure(description: str, future: asyncio.Future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None and not isinstance(error, discord.NotFound):
+            print(f"Error {description}: {error}")
+
+class PollEmbedRefresher:
+    """Coalesces vote-driven poll embed updates into at most one message edit per window.
+    
+    The first vote after a quiet window edits right away; votes inside the window
+    share a single trailing edit that renders the latest tallies.
+    """
+    
+    def __init__(self, bot):
+        self.bot = bot
+        self.pending = {}  # poll_id -> (task, message to edit)
+        self.last_edit = {}  # poll_id -> loop time of the last edit
+        self.requested = 0
+        self.edits = 0
+    
+    @property
+    def saved(self) -> int:
+        """Edits avoided by coalescing"""
+        return self.requested - self.edits - len(self.pending)
+    
+    def request(self, state: "GuildState", poll_id: str, message: discord.Message):
+        """Ask for a poll's message to show its current tallies"""
+        self.requested += 1
+        if poll_id in self.pending:
+            return  # The scheduled edit will pick up these votes
+        task = asyncio.create_task(self.refresh(state, poll_id))
+        self.pending[poll_id] = (task, message)
+    
+    def cancel(self, poll_id: str):
+        """Drop a poll's scheduled edit (e.g. because it is closing)"""
+        pending = self.pending.pop(poll_id, None)
+        if pending:
+            pending[0].cancel()
+        self.last_edit.pop(poll_id, None)
+    
+    async def refresh(self, state: "GuildState", poll_id: str):
+        loop = asyncio.get_running_loop()
+        wait = self.last_edit.get(poll_id, 0) + POLL_EMBED_REFRESH_SECONDS - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        
+        # Votes arriving during the edit schedule the next one
+        _, message = self.pending.pop(poll_id)
+        poll_data = state.active_polls.get(poll_id)
+        if poll_data is None:
+            return
+        
+        self.last_edit[poll_id] = loop.time()
+        self.edits += 1
+        metrics.inc("poll_embed_edits_total")
+        
+        # Rendered when the edit runs, so a queued edit still shows the latest tallies
+        async def edit():
+            poll_data = state.active_polls.get(poll_id)
+            if poll_data is not None:
+                await message.edit(embed=create_poll_embed(poll_data, poll_id))
+        
+        try:
+            await self.bot.rest_queue.submit("poll_refresh", message.channel.id, edit, key=("poll_message", poll_id))
+        except discord.HTTPException as e:
+            print(f"Error refreshing poll {poll_id}: {e}")
+
+class StickyScheduler:
+    """Debounces sticky note reposts, keeping at most one repost in flight per channel"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+        self.tasks = {}  # channel_id -> repost task
+        self.last_activity = {}  # channel_id -> loop time of the latest message
+    
+    def notify(self, channel: discord.abc.Messageable):
+        """Record activity in a sticky channel and make sure a repost is scheduled"""
+        channel_id = str(channel.id)
+        self.last_activity[channel_id] = asyncio.get_running_loop().time()
+        if channel_id not in self.tasks:
+            self.tasks[channel_id] = asyncio.create_task(self.run(channel))
+    
+    async def run(self, channel: discord.abc.Messageable):
+        channel_id = str(channel.id)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Wait for a quiet period, but never longer than the max wait
+                first_seen = loop.time()
+                while True:
+                    now = loop.time()
+                    due = min(self.last_activity[channel_id] + STICKY_QUIET_SECONDS, first_seen + STICKY_MAX_WAIT_SECONDS)
+                    if now >= due:
+                        break
+                    await asyncio.sleep(due - now)
+                
+                started = loop.time()
+                await self.repost(channel)
+                
+                # Messages that arrived during the repost need another one
+                if self.last_activity[channel_id] <= started:
+                    break
+        except Exception as e:
+            print(f"Error reposting sticky note in {channel_id}: {e}")
+        finally:
+            del self.tasks[channel_id]
+            self.last_activity.pop(channel_id, None)
+    
+    async def repost(self, channel: discord.abc.Messageable):
+        channel_id = str(channel.id)
+        state = await self.bot.guild_state(channel.guild.id)
+        with state.in_use():
+            sticky_data = state.sticky_notes.get(channel_id)
+            if sticky_data is None:
+                return
+            
+            # Nothing to do if the sticky is still the newest message
+            old_message_id = sticky_data.get('message_id')
+            if old_message_id and getattr(channel, 'last_message_id', None) == old_message_id:
+                metrics.inc("sticky_reposts_total", (("result", "skipped"),))
+                return
+            
+            # Delete old sticky message by ID, no fetch needed
+            rest_queue = self.bot.rest_queue
+            if old_message_id:
+                try:
+                    await rest_queue.submit("sticky", channel.id, channel.get_partial_message(old_message_id).delete)
+                except discord.NotFound:
+                    pass  # Already deleted
+                except discord.HTTPException as e:
+                    print(f"Error deleting sticky note in {channel_id}: {e}")
+            
+            new_message_id = await rest_queue.submit("sticky", channel.id, functools.partial(self.bot.repost_sticky_note, channel, sticky_data))
+            
+            # The sticky may have been replaced or removed while we were sending
+            if state.sticky_notes.get(channel_id) is not sticky_data:
+                try:
+                    await rest_queue.submit("sticky", channel.id, channel.get_partial_message(new_message_id).delete)
+                except discord.HTTPException as e:
+                    print(f"Error deleting replaced sticky note in {channel_id}: {e}")
+                return
+            
+            sticky_data['message_id'] = new_message_id
+            state.save_sticky_note(channel_id)
+            metrics.inc("sticky_reposts_total", (("result", "reposted"),))
+
+class EmbedCache:
+    """LRU of built embeds keyed by (kind, id), so static embed parts are only built once"""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.builds = 0
+    
+    def get(self, key: tuple):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return entry
+    
+    def put(self, key: tuple, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        self.builds += 1
+    
+    def invalidate(self, key: tuple):
+        self.entries.pop(key, None)
+
+class RoleNameIndex:
+    """Casefolded role name -> role IDs for one guild, kept current by role events"""
+    
+    def __init__(self, roles):
+        self.names = {}
+        for role in roles:
+            self.add(role)
+    
+    def add(self, role: discord.Role):
+        self.names.setdefault(role.name.casefold(), set()).add(role.id)
+    
+    def remove(self, role: discord.Role):
+        key = role.name.casefold()
+        role_ids = self.names.get(key)
+        if role_ids:
+            role_ids.discard(role.id)
+            if not role_ids:
+                del self.names[key]
+    
+    def resolve(self, text: str) -> tuple:
+        """Resolve a role mention or name to (role_id, None), or (None, "unknown" / "ambiguous")"""
+        match = re.fullmatch(r'<@&(\d+)>', text)
+        if match:
+            return int(match.group(1)), None
+        
+        role_ids = self.names.get(text.removeprefix('@').casefold())
+        if not role_ids:
+            return None, "unknown"
+        if len(role_ids) > 1:
+            return None, "ambiguous"
+        return next(iter(role_ids)), None
+    
+    def resolve_fields(self, multi_vote: str, single_vote: str, blocked: str) -> dict:
+        """Parse the role fields of a poll configuration in one pass.
+        
+        Returns the resolved multi_vote_config, single_vote_roles and blocked_roles, plus
+        the entries that were skipped as unknown, ambiguous or invalid (e.g. a missing count).
+        """
+        result = {"multi_vote_config": {}, "single_vote_roles": [], "blocked_roles": [],
+                  "unknown": [], "ambiguous": [], "invalid": []}
+        
+        for field, value in (("multi_vote_config", multi_vote), ("single_vote_roles", single_vote), ("blocked_roles", blocked)):
+            for entry in value.split(','):
+                entry = entry.strip()
+                if not entry:
+                    continue
+                
+                name = entry
+                if field == "multi_vote_config":
+                    name, _, count = entry.partition(':')
+                    name = name.strip()
+                    try:
+                        count = int(count)
+                    except ValueError:
+                        result["invalid"].append(entry)
+                        continue
+                
+                role_id, problem = self.resolve(name)
+                if problem:
+                    result[problem].append(name)
+                elif field == "multi_vote_config":
+                    result[field][str(role_id)] = count
+                else:
+                    result[field].append(role_id)
+        return result
+
+class GuildState:
+    """One guild's role config, polls, previews and sticky notes, with its own storage, writer and vote queue.
+    
+    Previews are only indexed (with their last_used time) at load time; each one is read from storage the first time it is used.
+    That saves memory with SQLite only: JsonStorage keeps every preview in its mirror regardless.
+    Polls are loaded whole, so their memory is only released when the guild is evicted.
+    """
+    
+    def __init__(self, bot, guild_id: int, loaded: dict):
+        self.bot = bot
+        self.guild_id = guild_id
+        self.last_used = time.monotonic()
+        self.users = 0  # Coroutines holding this state across an await
+        
+        self.storage = loaded["storage"]
+        self.role_config = loaded["role_config"]
+        self.active_polls = loaded["active_polls"]
+        self.preview_times = loaded["preview_times"]  # preview_id -> last_used, for expiry
+        self.poll_previews = {}  # Previews read so far, by preview_id
+        self.sticky_notes = loaded["sticky_notes"]
+        self.poll_rules = {}  # poll_id -> compiled PollRules
+        
+        # Command permissions compiled from role_config
+        self.permission_index = {}
+        self.rebuild_permission_index()
+        
+        # Changes are written in the background so handlers never touch the disk
+        self.persistence = PersistenceWriter(self.storage, self)
+        self.vote_queue = PollVoteQueue(self)
+        self.expire_previews()
+    
+    @staticmethod
+    def read(guild_id: int) -> dict:
+        """Load a guild's persisted state through the configured storage backend (blocking; run it in a thread)"""
+        storage = create_storage(guild_directory(guild_id))
+        try:
+            return {
+                "storage": storage,
+                "role_config": storage.load_config(),
+                "active_polls": storage.load_polls(),
+                "preview_times": storage.preview_times(),
+                "sticky_notes": storage.load_sticky_notes(),
+            }
+        except Exception:
+            storage.close()
+            raise
+    
+    @contextlib.contextmanager
+    def in_use(self):
+        """Keep the state loaded while a coroutine that will save to it is waiting on something"""
+        self.users += 1
+        try:
+            yield self
+        finally:
+            self.users -= 1
+    
+    def idle(self) -> bool:
+        """True when the state can be dropped from memory without losing anything"""
+        if self.users or not self.persistence.idle() or self.vote_queue.pending:
+            return False
+        # A scheduled embed refresh still holds this state's poll data
+        return not any(poll_id in self.bot.embed_refresher.pending for poll_id in self.active_polls)
+    
+    async def unload(self):
+        """Release an idle guild's state after a final flush; it is loaded again from storage on next use"""
+        await self.persistence.close()
+    
+    async def get_preview(self, preview_id: str) -> Optional[dict]:
+        """Return a poll preview, reading it from storage in a worker thread the first time it is used"""
+        preview_data = self.poll_previews.get(preview_id)
+        if preview_data is None and preview_id in self.preview_times:
+            with self.in_use():
+                preview_data = await self.persistence.read(self.storage.load_preview, preview_id)
+            # Deleted while it was read, or already read by a concurrent caller whose copy must win
+            if preview_data is None or preview_id not in self.preview_times:
+                return None
+            preview_data = self.poll_previews.setdefault(preview_id, preview_data)
+        return preview_data
+    
+    def delete_preview(self, preview_id: str):
+        """Remove a poll preview and any scheduled start"""
+        self.bot.start_scheduler.cancel(preview_id)
+        self.preview_times.pop(preview_id, None)
+        self.poll_previews.pop(preview_id, None)
+        self.bot.embed_cache.invalidate(("preview", preview_id))
+        self.persistence.mark_dirty("previews", preview_id)
+    
+    def preview_age_start(self, preview_id: str) -> Optional[float]:
+        """Timestamp a preview's age is measured from: its last save, or the snowflake its ID starts with"""
+        last_used = self.preview_times.get(preview_id)
+        if last_used:
+            return datetime.fromisoformat(last_used).timestamp()
+        snowflake = preview_id.split('_', 1)[0]
+        return discord.utils.snowflake_time(int(snowflake)).timestamp() if snowflake.isdigit() else None
+    
+    def expire_previews(self) -> int:
+        """Delete previews that have not been saved, edited or scheduled for PREVIEW_TTL_DAYS.
+        
+        Previews with a pending start are never expired.
+        """
+        if PREVIEW_TTL_DAYS <= 0:
+            return 0
+        cutoff = time.time() - PREVIEW_TTL_DAYS * 86400
+        scheduled = self.bot.start_scheduler.deadlines
+        expired = []
+        for preview_id in self.preview_times:
+            if preview_id in scheduled or (self.poll_previews.get(preview_id) or {}).get("start"):
+                continue
+            age_start = self.preview_age_start(preview_id)
+            if age_start is not None and age_start < cutoff:
+                expired.append(preview_id)
+        for preview_id in expired:
+            self.delete_preview(preview_id)
+        if expired:
+            metrics.inc("previews_expired_total", value=len(expired))
+        return len(expired)
+    
+    def save_config(self):
+        """Schedule role configuration to be saved and recompile permissions"""
+        self.rebuild_permission_index()
+        self.bot.permission_version += 1
+        self.bot.permission_cache.clear()
+        self.persistence.mark_dirty("config")
+    
+    def rebuild_permission_index(self):
+        """Compile enabled_roles into a frozenset of role IDs per command"""
+        self.permission_index = {
+            command: frozenset(role_ids)
+            for command, role_ids in self.role_config["enabled_roles"].items()
+            if role_ids
+        }
+    
+    def add_poll(self, poll_id: str, poll_data: dict):
+        """Register a new active poll: save it, compile its voting rules and schedule its close"""
+        poll_data["persistent_view"] = True  # Its message is sent with PollVoteButton custom_ids
+        self.active_polls[poll_id] = poll_data
+        self.poll_rules[poll_id] = PollRules(poll_data)
+        self.save_poll(poll_id)
+        self.bot.poll_scheduler.schedule(self.guild_id, poll_id, poll_data['end_time'])
+    
+    def get_poll_rules(self, poll_id: str) -> PollRules:
+        """Return a poll's compiled voting rules, compiling them for polls loaded from storage"""
+        rules = self.poll_rules.get(poll_id)
+        if rules is None:
+            rules = self.poll_rules[poll_id] = PollRules(self.active_polls[poll_id])
+        return rules
+    
+    def save_poll(self, poll_id: str):
+        """Schedule an active poll's settings to be saved"""
+        self.bot.embed_cache.invalidate(("poll", poll_id))
+        self.persistence.mark_dirty("polls", poll_id)
+    
+    def delete_poll(self, poll_id: str):
+        """Remove an active poll and its votes"""
+        self.active_polls.pop(poll_id, None)
+        self.poll_rules.pop(poll_id, None)
+        self.bot.poll_scheduler.cancel(poll_id)
+        self.vote_queue.forget(poll_id)
+        self.bot.embed_cache.invalidate(("poll", poll_id))
+        self.persistence.mark_dirty("polls", poll_id)
+    
+    def archive_poll(self, poll_id: str, winners: List[int]):
+        """Move a closed poll, with all of its votes, from the active polls to the archive"""
+        poll_data = dict(self.active_polls[poll_id], closed_at=datetime.now().isoformat(), winners=winners)
+        self.persistence.archive(poll_id, poll_data)
+        self.delete_poll(poll_id)
+        metrics.inc("polls_archived_total")
+    
+    def append_vote(self, poll_id: str, user_id: int, option_index: int):
+        """Schedule a single vote to be saved"""
+        self.persistence.add_vote(poll_id, user_id, option_index)
+    
+    def save_preview(self, preview_id: str):
+        """Schedule a poll preview to be saved, marking it used now"""
+        last_used = self.poll_previews[preview_id]["last_used"] = datetime.now().isoformat()
+        self.preview_times[preview_id] = last_used
+        self.bot.embed_cache.invalidate(("preview", preview_id))
+        self.persistence.mark_dirty("previews", preview_id)
+    
+    def schedule_start(self, preview_id: str, start_time: datetime, channel_id: int, creator_id: int):
+        """Start a preview as a poll at start_time, replacing any earlier schedule"""
+        start = {"time": start_time.isoformat(), "channel_id": channel_id, "creator_id": creator_id}
+        self.poll_previews[preview_id]["start"] = start
+        self.save_preview(preview_id)
+        self.bot.start_scheduler.schedule(self.guild_id, preview_id, start["time"])
+    
+    def unschedule_start(self, preview_id: str) -> Optional[dict]:
+        """Cancel a preview's scheduled start, returning the schedule if it had one"""
+        self.bot.start_scheduler.cancel(preview_id)
+        start = self.poll_previews[preview_id].pop("start", None)
+        if start:
+            self.save_preview(preview_id)
+        return start
+    
+    def save_sticky_note(self, channel_id: str):
+        """Schedule a channel's sticky note to be saved"""
+        self.bot.sticky_channels[channel_id] = self.guild_id
+        self.persistence.mark_dirty("sticky_notes", channel_id)
+    
+    def delete_sticky_note(self, channel_id: str):
+        """Remove a channel's sticky note"""
+        self.sticky_notes.pop(channel_id, None)
+        self.bot.sticky_channels.pop(channel_id, None)
+        self.bot.embed_cache.invalidate(("sticky", channel_id))
+        self.persistence.mark_dirty("sticky_notes", channel_id)
+
+class PollCommandTree(app_commands.CommandTree):
+    """Command tree that timestamps each command interaction for latency metrics"""
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras['started'] = time.perf_counter()
+        return True
 
-class PollBot(commands.Bot):
+class PollBot(commands.AutoShardedBot if SHARDED else commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
         intents.message_content = True
         intents.guilds = True
         intents.members = True
         
-        super().__init__(command_prefix='!', intents=intents)
+        options = {"shard_count": SHARD_COUNT} if SHARDED and SHARD_COUNT else {}
+        super().__init__(command_prefix='!', intents=intents, tree_cls=PollCommandTree,
+                         max_ratelimit_timeout=REST_MAX_RATELIMIT_WAIT, **options)
+        
+        # Per-guild state, loaded the first time a guild is used
+        self.guild_states = OrderedDict()  # guild_id -> GuildState, least recently used first
+        self.guild_loads = {}  # guild_id -> task loading that guild's state
+        self.guild_unloads = {}  # guild_id -> task flushing and closing an evicted state
+        self.sticky_channels = {}  # channel_id -> guild_id, so messages elsewhere never load a guild
+        self.persistence_started = False
+        self.maintenance_task = None
         
-        # Load role configuration
-        self.role_config = self.load_config()
-        self.active_polls = self.load_polls()
-        self.poll_previews = self.load_previews()
-        self.sticky_notes = self.load_sticky_notes()
+        self.embed_cache = EmbedCache(EMBED_CACHE_SIZE)
+        self.poll_scheduler = PollScheduler(self)
+        self.start_scheduler = PollStartScheduler(self)
+        self.embed_refresher = PollEmbedRefresher(self)
+        self.sticky_scheduler = StickyScheduler(self)
+        self.rest_queue = RestQueue()
+        
+        # Permission decisions cached per (guild, member, command)
+        self.permission_version = 0
+        self.permission_cache = OrderedDict()
+        self.role_indexes = {}  # guild_id -> RoleNameIndex, built when a guild's roles are first resolved
+        
+        self.metrics_runner = None
+        self.loop_lag_task = None
+        self.watchdog = LoopWatchdog(LOOP_WATCHDOG_MS) if LOOP_WATCHDOG_MS > 0 else None
     
-    def load_config(self):
-        """Load role configuration from file"""
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        return {"enabled_roles": {}}
+    async def setup_hook(self):
+        self.persistence_started = True
+        for state in self.guild_states.values():
+            state.persistence.start()
+        self.rest_queue.start()
+        
+        # One dispatcher serves the vote buttons of every poll message, old or new
+        self.add_dynamic_items(PollVoteButton, PollBrowseButton)
+        
+        # Sync once per process, not on every (re)connect
+        await self.sync_commands()
+        
+        # Every guild's deadlines, scheduled starts and sticky channels are indexed up front; its state only
+        # loads when used. Polls that ended or were due to start while the bot was down run as soon as it is ready
+        for guild_id, index in await asyncio.to_thread(self.load_indexes):
+            for poll_id, end_time in index["poll_deadlines"].items():
+                self.poll_scheduler.schedule(guild_id, poll_id, end_time)
+            for preview_id, start_time in index["poll_starts"].items():
+                self.start_scheduler.schedule(guild_id, preview_id, start_time)
+            for channel_id in index["sticky_channels"]:
+                self.sticky_channels[channel_id] = guild_id
+        self.poll_scheduler.start()
+        self.start_scheduler.start()
+        self.maintenance_task = asyncio.create_task(self.maintain_working_set())
+        
+        # Instrumentation: REST traffic, 429 retries, event loop lag and queue depths
+        self.instrument_http()
+        logging.getLogger('discord.http').addHandler(RateLimitLogHandler())
+        metrics.gauge_callback("persistence_queue_depth", lambda: sum(
+            state.persistence.queue.qsize() + state.persistence.pending for state in self.guild_states.values()
+        ))
+        metrics.gauge_callback("scheduled_polls", lambda: len(self.poll_scheduler.deadlines))
+        metrics.gauge_callback("scheduled_poll_starts", lambda: len(self.start_scheduler.deadlines))
+        metrics.gauge_callback("active_polls", lambda: sum(len(state.active_polls) for state in self.guild_states.values()))
+        metrics.gauge_callback("loaded_guilds", lambda: len(self.guild_states))
+        metrics.gauge_callback("poll_embed_edits_saved", lambda: self.embed_refresher.saved)
+        metrics.gauge_callback("rest_queue_depth", lambda: self.rest_queue.depth)
+        metrics.gauge_callback("rest_queue_in_flight", lambda: len(self.rest_queue.busy))
+        self.loop_lag_task = asyncio.create_task(self.monitor_loop_lag())
+        if METRICS_PORT:
+            await self.start_metrics_server()
+        if self.watchdog:
+            self.start_watchdog()
     
-    def save_config(self):
-        """Save role configuration to file"""
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(self.role_config, f, indent=2)
+    async def guild_state(self, guild_id: int) -> GuildState:
+        """Return a guild's state, loading it from its data directory on first use.
+        
+        Concurrent first uses share one load, which reads storage in a worker thread.
+        """
+        state = self.guild_states.get(guild_id)
+        if state is None:
+            task = self.guild_loads.get(guild_id)
+            if task is None and guild_id in self.guild_unloads:
+                # Let the evicted state finish writing before reading the guild back
+                await asyncio.shield(self.guild_unloads[guild_id])
+                return await self.guild_state(guild_id)
+            if task is None:
+                task = self.guild_loads[guild_id] = asyncio.create_task(self.load_guild_state(guild_id))
+            # Shielded so one cancelled handler doesn't abort the load the others wait on
+            state = await asyncio.shield(task)
+        else:
+            self.guild_states.move_to_end(guild_id)
+        state.last_used = time.monotonic()
+        return state
     
-    def load_polls(self):
-        """Load active polls from file"""
-        if os.path.exists(POLLS_FILE):
-            with open(POLLS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
+    async def load_guild_state(self, guild_id: int) -> GuildState:
+        try:
+            loaded = await asyncio.to_thread(GuildState.read, guild_id)
+            state = self.guild_states[guild_id] = GuildState(self, guild_id, loaded)
+            metrics.inc("guild_loads_total")
+        finally:
+            del self.guild_loads[guild_id]
+        
+        if self.persistence_started:
+            state.persistence.start()
+            
+            # One-time migration for polls saved before channel_id was always recorded or buttons were persistent
+            if any("channel_id" not in poll_data or not poll_data.get("persistent_view") for poll_data in state.active_polls.values()):
+                asyncio.create_task(self.migrate_poll_messages(state))
+        return state
     
-    def save_polls(self):
-        """Save active polls to file"""
-        with open(POLLS_FILE, 'w') as f:
-            json.dump(self.active_polls, f, indent=2)
-    
-    def load_previews(self):
-        """Load poll previews from file"""
-        if os.path.exists(PREVIEWS_FILE):
-            with open(PREVIEWS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    
-    def save_previews(self):
-        """Save poll previews to file"""
-        with open(PREVIEWS_FILE, 'w') as f:
-            json.dump(self.poll_previews, f, indent=2)
-    
-    def load_sticky_notes(self):
-        """Load sticky notes from file"""
-        if os.path.exists(STICKY_NOTES_FILE):
-            with open(STICKY_NOTES_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    
-    def save_sticky_notes(self):
-        """Save sticky notes to file"""
-        with open(STICKY_NOTES_FILE, 'w') as f:
-            json.dump(self.sticky_notes, f, indent=2)
+    async def sync_commands(self):
+        """Sync the command tree, skipping scopes whose payload hash matches the last sync"""
+        synced = read_json_file(COMMAND_HASH_FILE, {})
+        
+        # Guild syncs apply instantly; without COMMAND_GUILD_IDS commands are synced globally
+        for guild in [discord.Object(id=guild_id) for guild_id in COMMAND_GUILD_IDS] or [None]:
+            if guild:
+                self.tree.copy_global_to(guild=guild)
+            scope = f"{self.application_id}:{guild.id if guild else 'global'}"
+            payload = [command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)]
+            digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+            
+            if synced.get(scope) == digest and not FORCE_COMMAND_SYNC:
+                metrics.inc("command_syncs_total", (("result", "skipped"),))
+                print(f"Commands unchanged for {scope}, skipping sync")
+                continue
+            
+            try:
+                await self.tree.sync(guild=guild)
+            except discord.HTTPException as e:
+                print(f"Error syncing commands for {scope}: {e}")
+                continue
+            metrics.inc("command_syncs_total", (("result", "synced"),))
+            print(f"Commands synced for {scope}")
+            synced[scope] = digest
+            os.makedirs(DATA_DIRECTORY, exist_ok=True)
+            write_json_file(COMMAND_HASH_FILE, synced)
+    
+    async def migrate_poll_messages(self, state: GuildState):
+        """Bring a guild's legacy poll messages up to date, once per poll.
+        
+        Polls saved without channel_id get it filled in so closing them needs no channel scan,
+        and messages posted with random custom_ids get their persistent vote buttons attached.
+        """
+        await self.wait_until_ready()
+        with state.in_use():
+            for poll_id in [poll_id for poll_id, poll_data in state.active_polls.items() if not poll_data.get("persistent_view")]:
+                try:
+                    channel_id = await locate_poll_channel(state, poll_id)
+                    poll_data = state.active_polls.get(poll_id)
+                    if poll_data is None:
+                        continue  # Closed while this ran
+                    if channel_id is None:
+                        print(f"⚠️ Could not find the message of poll {poll_id}")
+                        continue
+                    
+                    channel = self.get_partial_messageable(channel_id, guild_id=state.guild_id)
+                    message = channel.get_partial_message(poll_data["message_id"])
+                    
+                    # Checked when the edit runs, so a poll closed in the meantime keeps its disabled buttons
+                    async def attach_view():
+                        if poll_id in state.active_polls and poll_id not in state.vote_queue.closed:
+                            await message.edit(view=AdvancedPollView(poll_id, poll_data))
+                    
+                    # Not keyed: vote refreshes only edit the embed, so they must not replace this edit
+                    await self.rest_queue.submit("migration", channel_id, attach_view)
+                except Exception as e:
+                    print(f"Error migrating poll {poll_id}: {e}")
+                    continue
+                
+                if poll_id in state.active_polls:
+                    poll_data["persistent_view"] = True
+                    state.save_poll(poll_id)
+    
+    def load_indexes(self) -> List[tuple]:
+        """Read (guild_id, index) for every stored guild without loading its state"""
+        indexes = []
+        for guild_id in stored_guild_ids():
+            storage = create_storage(guild_directory(guild_id))
+            try:
+                indexes.append((guild_id, storage.load_index()))
+            finally:
+                storage.close()
+        return indexes
+    
+    def evict_guilds(self) -> int:
+        """Unload idle guilds that have not been used recently or exceed GUILD_CACHE_SIZE; each is flushed and closed in the background"""
+        idle_before = time.monotonic() - GUILD_IDLE_SECONDS
+        excess = len(self.guild_states) - GUILD_CACHE_SIZE
+        evicted = 0
+        for guild_id, state in list(self.guild_states.items()):
+            if state.last_used > idle_before and evicted >= excess:
+                break  # Everything after this was used more recently
+            if state.idle():
+                del self.guild_states[guild_id]
+                self.guild_unloads[guild_id] = asyncio.create_task(self.unload_guild_state(guild_id, state))
+                evicted += 1
+        if evicted:
+            metrics.inc("guild_evictions_total", value=evicted)
+        return evicted
+    
+    async def unload_guild_state(self, guild_id: int, state: GuildState):
+        try:
+            await state.unload()
+        except Exception as e:
+            print(f"Error unloading guild {guild_id}: {e}")
+        finally:
+            del self.guild_unloads[guild_id]
+    
+    async def maintain_working_set(self):
+        """Periodically expire old previews and unload idle guilds"""
+        while True:
+            await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+            try:
+                for state in list(self.guild_states.values()):
+                    state.expire_previews()
+                self.evict_guilds()
+            except Exception as e:
+                print(f"Error maintaining guild state: {e}")
+    
+    def instrument_http(self):
+        """Count every REST request discord.py makes, by method and route template"""
+        request = self.http.request
+        
+        async def counted_request(route, **kwargs):
+            metrics.inc("rest_requests_total", (("method", route.method), ("route", route.path)))
+            return await request(route, **kwargs)
+        
+        self.http.request = counted_request
+    
+    async def monitor_loop_lag(self):
+        """Measure how late the event loop wakes up from a fixed sleep"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL_SECONDS)
+            lag = max(0.0, loop.time() - started - LOOP_LAG_INTERVAL_SECONDS)
+            metrics.set_gauge("event_loop_lag_seconds", lag)
+            metrics.observe("event_loop_lag", lag)
+    
+    def start_watchdog(self):
+        """Attribute stalls to slash commands and background tasks as well as the timed handlers"""
+        for command in self.tree.walk_commands():
+            HANDLER_CODES[command.callback.__code__] = f"command:{command.qualified_name}"
+        for label, func in (
+            ("task:persistence_flush", PersistenceWriter.flush),
+            ("task:poll_embed_refresh", PollEmbedRefresher.refresh),
+            ("task:sticky_repost", StickyScheduler.repost),
+            ("task:close_poll", close_poll),
+            ("task:rest_queue", RestQueue.execute),
+        ):
+            HANDLER_CODES[func.__code__] = label
+        self.watchdog.start()
+        print(f"Event loop watchdog reporting stalls over {LOOP_WATCHDOG_MS:g} ms")
+    
+    async def start_metrics_server(self):
+        """Serve /metrics in Prometheus text format on METRICS_HOST:METRICS_PORT"""
+        async def handle_metrics(request):
+            return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+        
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        self.metrics_runner = web.AppRunner(app, access_log=None)
+        await self.metrics_runner.setup()
+        try:
+            await web.TCPSite(self.metrics_runner, METRICS_HOST, METRICS_PORT).start()
+            print(f"Metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"Could not start metrics endpoint: {e}")
+    
+    def record_command(self, interaction: discord.Interaction, status: str):
+        """Record a finished slash command's latency and outcome"""
+        name = interaction.command.qualified_name if interaction.command else "unknown"
+        metrics.inc("commands_total", (("name", name), ("status", status)))
+        started = interaction.extras.get('started')
+        if started is not None:
+            metrics.observe("handler_latency_seconds", time.perf_counter() - started, (("kind", "command"), ("name", name)))
+    
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        self.record_command(interaction, "ok")
+    
+    async def close(self):
+        self.poll_scheduler.stop()
+        self.start_scheduler.stop()
+        self.rest_queue.stop()
+        if self.maintenance_task:
+            self.maintenance_task.cancel()
+        if self.loop_lag_task:
+            self.loop_lag_task.cancel()
+        if self.watchdog:
+            self.watchdog.stop()
+            if self.watchdog.stalls:
+                self.watchdog.write_profile()
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
+        await super().close()
+        for state in self.guild_states.values():
+            await state.persistence.close()
+        if self.guild_unloads:
+            await asyncio.gather(*self.guild_unloads.values())
+        
+        refresher = self.embed_refresher
+        print(f"Poll embeds: {refresher.requested} updates, {refresher.edits} edits ({refresher.saved} saved)")
     
     async def on_ready(self):
         print(f'{self.user} has connected to Discord!')
-        
-        # Sync commands only to the specified guild
-        guild = discord.Object(id=GUILD_ID)
-        self.tree.copy_global_to(guild=guild)
-        await self.tree.sync(guild=guild)
-        print(f'Commands synced to guild {GUILD_ID}')
     
+    @timed("event", "on_message")
     async def on_message(self, message):
         """Handle new messages to check for sticky note updates"""
-        if message.author.bot:
+        if message.author.bot or message.guild is None:
             return
         
         channel_id = str(message.channel.id)
         
-        # Check if this channel has sticky notes
-        if channel_id in self.sticky_notes:
-            sticky_data = self.sticky_notes[channel_id]
-            
-            # Delete old sticky message if it exists
-            try:
-                if sticky_data.get('message_id'):
-                    old_message = await message.channel.fetch_message(sticky_data['message_id'])
-                    await old_message.delete()
-            except:
-                pass  # Message might already be deleted
-            
-            # Repost sticky note
-            new_message_id = await self.repost_sticky_note(message.channel, sticky_data)
-            # Update message_id in sticky_data
-            self.sticky_notes[channel_id]['message_id'] = new_message_id
-            self.save_sticky_notes()
+        # Reposting is debounced per channel so bursts of messages share one repost
+        if channel_id in self.sticky_channels:
+            self.sticky_scheduler.notify(message.channel)
     
-    def is_admin_or_allowed_role(self, interaction: discord.Interaction, command_name: str):
+    async def is_admin_or_allowed_role(self, interaction: discord.Interaction, command_name: str):
         """Check if user has admin permissions or allowed role for command"""
-        # Check if user has administrator permissions
-        if interaction.user.guild_permissions.administrator:
-            return True
+        if interaction.guild_id is None:
+            return False
         
-        # Check if command has enabled roles and user has one of them
-        if command_name in self.role_config["enabled_roles"]:
-            user_role_ids = [role.id for role in interaction.user.roles]
-            allowed_role_ids = self.role_config["enabled_roles"][command_name]
-            return any(role_id in allowed_role_ids for role_id in user_role_ids)
+        key = (interaction.guild_id, interaction.user.id, command_name, self.permission_version)
+        allowed = self.permission_cache.get(key)
+        if allowed is not None:
+            self.permission_cache.move_to_end(key)
+            return allowed
         
-        return False
+        # Admins can use everything; otherwise the user needs one of the command's roles
+        if interaction.user.guild_permissions.administrator:
+            allowed = True
+        else:
+            allowed_role_ids = (await self.guild_state(interaction.guild_id)).permission_index.get(command_name)
+            allowed = bool(allowed_role_ids) and not allowed_role_ids.isdisjoint(role.id for role in interaction.user.roles)
+        
+        self.permission_cache[key] = allowed
+        if len(self.permission_cache) > PERMISSION_CACHE_SIZE:
+            self.permission_cache.popitem(last=False)
+        return allowed
+    
+    def forget_member_permissions(self, guild_id: int, user_id: int):
+        """Drop cached permission decisions for a member"""
+        for key in [key for key in self.permission_cache if key[0] == guild_id and key[1] == user_id]:
+            del self.permission_cache[key]
+    
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        """Cached permission decisions depend on the member's roles"""
+        if before.roles != after.roles:
+            self.forget_member_permissions(after.guild.id, after.id)
+    
+    def role_index(self, guild: discord.Guild) -> RoleNameIndex:
+        """Return a guild's role name index, building it on first use"""
+        index = self.role_indexes.get(guild.id)
+        if index is None:
+            index = self.role_indexes[guild.id] = RoleNameIndex(guild.roles)
+        return index
+    
+    async def on_guild_role_create(self, role: discord.Role):
+        index = self.role_indexes.get(role.guild.id)
+        if index:
+            index.add(role)
+    
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        """A role's permissions (e.g. administrator) or name may have changed"""
+        if before.permissions != after.permissions:
+            self.permission_cache.clear()
+        index = self.role_indexes.get(after.guild.id)
+        if index and before.name != after.name:
+            index.remove(before)
+            index.add(after)
+    
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.permission_cache.clear()
+        index = self.role_indexes.get(role.guild.id)
+        if index:
+            index.remove(role)
+    
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.role_indexes.pop(guild.id, None)
     
     async def repost_sticky_note(self, channel, sticky_data):
         """Repost a sticky note and return the new message ID"""
         if sticky_data["type"] == "embed":
-            embed = discord.Embed(
-                title=sticky_data.get("title", "Sticky Note"),
-                description=sticky_data["content"],
-                color=sticky_data.get("color", 0x3498db)
-            )
-            
-            # Add custom footer text
-            footer_text = sticky_data.get("footer_text", "This is a sticky note")
-            embed.set_footer(text=f"📌 {footer_text}")
-            
-            # Add image if provided
-            if sticky_data.get("image_url"):
-                embed.set_image(url=sticky_data["image_url"])
-            
+            embed = create_sticky_embed(sticky_data, str(channel.id))
             message = await channel.send(embed=embed)
         else:
             # For regular messages, just send the content directly
@@ -159,14 +2509,14 @@ bot = PollBot()
 
 # Custom check decorator for admin or allowed roles
 def admin_or_allowed_role(command_name: str):
-    def predicate(interaction: discord.Interaction):
-        return bot.is_admin_or_allowed_role(interaction, command_name)
+    async def predicate(interaction: discord.Interaction):
+        return await bot.is_admin_or_allowed_role(interaction, command_name)
     return app_commands.check(predicate)
 
-# Check to ensure commands only work in the specified guild
+# Check to ensure commands only work inside a guild
 def guild_only():
     def predicate(interaction: discord.Interaction):
-        return interaction.guild_id == GUILD_ID
+        return interaction.guild_id is not None
     return app_commands.check(predicate)
 
 def parse_color(color_str: str) -> int:
@@ -270,22 +2620,24 @@ async def config_command(interaction: discord.Interaction, action: str, command:
         await interaction.response.send_message("❌ Action must be 'enable' or 'disable'", ephemeral=True)
         return
     
+    state = await bot.guild_state(interaction.guild_id)
+    
     # Initialize command in config if it doesn't exist
-    if command not in bot.role_config["enabled_roles"]:
-        bot.role_config["enabled_roles"][command] = []
+    if command not in state.role_config["enabled_roles"]:
+        state.role_config["enabled_roles"][command] = []
     
     if action == "enable":
-        if role.id not in bot.role_config["enabled_roles"][command]:
-            bot.role_config["enabled_roles"][command].append(role.id)
-            bot.save_config()
+        if role.id not in state.role_config["enabled_roles"][command]:
+            state.role_config["enabled_roles"][command].append(role.id)
+            state.save_config()
             await interaction.response.send_message(f"✅ Enabled role **{role.name}** for command `{command}`", ephemeral=True)
         else:
             await interaction.response.send_message(f"⚠️ Role **{role.name}** is already enabled for command `{command}`", ephemeral=True)
     
     elif action == "disable":
-        if role.id in bot.role_config["enabled_roles"][command]:
-            bot.role_config["enabled_roles"][command].remove(role.id)
-            bot.save_config()
+        if role.id in state.role_config["enabled_roles"][command]:
+            state.role_config["enabled_roles"][command].remove(role.id)
+            state.save_config()
             await interaction.response.send_message(f"✅ Disabled role **{role.name}** for command `{command}`", ephemeral=True)
         else:
             await interaction.response.send_message(f"⚠️ Role **{role.name}** is not enabled for command `{command}`", ephemeral=True)
@@ -296,121 +2648,477 @@ async def config_command(interaction: discord.Interaction, action: str, command:
 async def list_permissions(interaction: discord.Interaction):
     """List current role permissions"""
     
-    if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ You need Administrator permissions to use this command!", ephemeral=True)
-        return
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ You need Administrator permissions to use this command!", ephemeral=True)
+        return
+    
+    enabled_roles = (await bot.guild_state(interaction.guild_id)).role_config["enabled_roles"]
+    guild = interaction.guild
+    
+    def render_field(entry):
+        command_name, role_ids = entry
+        role_mentions = [f"<@&{role_id}>" if guild.get_role(role_id) else f"<@&{role_id}> (deleted)" for role_id in role_ids]
+        return f"Command: {command_name}", ", ".join(role_mentions)
+    
+    paginator = EmbedPaginator(
+        interaction.user.id, "📋 Command Role Permissions",
+        [(command_name, role_ids) for command_name, role_ids in enabled_roles.items() if role_ids], render_field,
+        empty="No role permissions configured yet."
+    )
+    await paginator.send(interaction)
+
+@bot.tree.command(name="pollcreate", description="Create a poll preview (use /pollstart to actually start it)")
+@app_commands.describe(
+    question="The poll question",
+    duration="Poll duration (e.g., 30m, 2h, 1d, 1w, 1mo)",
+    emotes="Voting emotes (space separated, e.g., :thumbsup: :thumbsdown:)",
+    color="Embed color (hex code like #ff0000 or color name like red, blue, purple, etc.)"
+)
+@guild_only()
+@admin_or_allowed_role("pollcreate")
+async def create_poll(interaction: discord.Interaction, question: str, duration: str, emotes: str, color: str = "blue"):
+    """Create a poll preview - use /pollstart to send it to a channel"""
+    
+    try:
+        duration_seconds = parse_duration(duration)
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ {str(e)}", ephemeral=True)
+        return
+    
+    # Parse color
+    embed_color = parse_color(color)
+    
+    # Parse emotes
+    emote_list = emotes.split()
+    if len(emote_list) < 2:
+        await interaction.response.send_message("❌ You need at least 2 emotes for voting!", ephemeral=True)
+        return
+    
+    if len(emote_list) > 30:
+        await interaction.response.send_message("❌ Maximum 30 emotes allowed!", ephemeral=True)
+        return
+    
+    # Show configuration modal
+    modal = PollConfigModal(question, duration_seconds, emote_list, embed_color, is_preview=True)
+    await interaction.response.send_modal(modal)
+
+@bot.tree.command(name="pollstart", description="Start a poll from a preview in a specific channel")
+@app_commands.describe(
+    preview_id="The preview ID to start",
+    channel="Channel to send the poll to (optional - uses current channel if not specified)",
+    start_time="When to start (optional): an ISO date/time like 2025-06-01T18:00, or a delay like 30m or 2h"
+)
+@guild_only()
+@admin_or_allowed_role("pollstart")
+async def start_poll(interaction: discord.Interaction, preview_id: str, channel: Optional[discord.TextChannel] = None,
+                     start_time: Optional[str] = None):
+    """Start a poll from a preview, now or at a scheduled time"""
+    
+    state = await bot.guild_state(interaction.guild_id)
+    preview_data = await state.get_preview(preview_id)
+    if preview_data is None:
+        await interaction.response.send_message("❌ Preview not found! Use `/pollcreate` to create a preview first.", ephemeral=True)
+        return
+    
+    target_channel = channel or interaction.channel
+    if start_time:
+        try:
+            start_at = parse_start_time(start_time)
+        except ValueError as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
+        state.schedule_start(preview_id, start_at, target_channel.id, interaction.user.id)
+        await interaction.response.send_message(
+            f"⏰ Poll scheduled in {target_channel.mention} <t:{int(start_at.timestamp())}:R>!", ephemeral=True
+        )
+        return
+    
+    # Starting now replaces any scheduled start, so the scheduler can't post it a second time
+    state.unschedule_start(preview_id)
+    with state.in_use():
+        await interaction.response.send_message(f"✅ Poll started in {target_channel.mention}!", ephemeral=True)
+        
+        poll_data = poll_from_preview(preview_data, target_channel.id, interaction.user.id)
+        await post_poll(state, str(interaction.id), poll_data, target_channel)
+
+@bot.tree.command(name="pollunschedule", description="Cancel the scheduled start of a poll preview")
+@app_commands.describe(preview_id="The preview ID whose scheduled start to cancel")
+@guild_only()
+@admin_or_allowed_role("pollstart")
+async def unschedule_poll(interaction: discord.Interaction, preview_id: str):
+    """Cancel a preview's scheduled start; the preview itself is kept"""
+    
+    state = await bot.guild_state(interaction.guild_id)
+    if await state.get_preview(preview_id) is None:
+        await interaction.response.send_message("❌ Preview not found!", ephemeral=True)
+        return
+    
+    start = state.unschedule_start(preview_id)
+    if start is None:
+        await interaction.response.send_message("❌ This preview has no scheduled start!", ephemeral=True)
+        return
+    await interaction.response.send_message(
+        f"✅ Cancelled the start <t:{int(datetime.fromisoformat(start['time']).timestamp())}:R> in <#{start['channel_id']}>. "
+        f"Use `/pollstart {preview_id}` to start or reschedule it.", ephemeral=True
+    )
+
+def poll_from_preview(preview_data: dict, channel_id: int, creator_id: int) -> dict:
+    """Build an active poll from a preview, ending its duration from now"""
+    end_time = datetime.now() + timedelta(seconds=preview_data['duration'])
+    return {
+        "question": preview_data['question'],
+        "titles": preview_data['titles'],
+        "image_urls": preview_data['image_urls'],
+        "emotes": preview_data['emotes'],
+        "multi_vote_config": preview_data['multi_vote_config'],
+        "single_vote_roles": preview_data['single_vote_roles'],
+        "blocked_roles": preview_data['blocked_roles'],
+        "color": preview_data['color'],
+        "end_time": end_time.isoformat(),
+        "votes": empty_tally(len(preview_data['titles'])),
+        "user_votes": {},
+        "channel_id": channel_id,
+        "creator_id": creator_id
+    }
+
+async def post_poll(state: GuildState, poll_id: str, poll_data: dict, channel: discord.abc.Messageable, kind: str = "command"):
+    """Register a poll and send its message to channel"""
+    with state.in_use():
+        state.add_poll(poll_id, poll_data)
+        
+        # Create and send poll
+        view = AdvancedPollView(poll_id, poll_data)
+        embed = create_poll_embed(poll_data, poll_id)
+        try:
+            message = await bot.rest_queue.submit(kind, channel.id, functools.partial(channel.send, embed=embed, view=view))
+        except BaseException:
+            # Nothing was posted: drop the registration so no poll is left without a message
+            state.delete_poll(poll_id)
+            raise
+        
+        # Store message reference
+        state.active_polls[poll_id]["message_id"] = message.id
+        state.save_poll(poll_id)
+
+def parse_start_time(text: str) -> datetime:
+    """Parse a poll start time: an ISO 8601 date/time, or a delay from now in parse_duration's format"""
+    try:
+        start_time = datetime.now() + timedelta(seconds=parse_duration(text))
+    except ValueError:
+        try:
+            start_time = datetime.fromisoformat(text.strip())
+        except ValueError:
+            raise ValueError("Start time must be an ISO date/time like 2025-06-01T18:00, or a delay like 30m or 2h")
+        if start_time.tzinfo:
+            start_time = start_time.astimezone().replace(tzinfo=None)
+    
+    if start_time < datetime.now():
+        raise ValueError("Start time is in the past")
+    if PREVIEW_TTL_DAYS > 0 and start_time > datetime.now() + timedelta(days=PREVIEW_TTL_DAYS):
+        raise ValueError(f"Start time is more than {PREVIEW_TTL_DAYS:g} days away")
+    return start_time
+
+async def start_scheduled_poll(state: GuildState, preview_id: str):
+    """Start a preview's scheduled poll.
+    
+    The schedule is cleared only once the poll is posted. If posting fails it stays on the
+    preview, to be retried on the next restart or replaced with /pollstart or /pollunschedule,
+    and the creator is told.
+    """
+    preview_data = await state.get_preview(preview_id)
+    if preview_data is None or not preview_data.get("start"):
+        return  # Deleted or started since it was scheduled
+    
+    start = preview_data["start"]
+    poll_id = f"{preview_id}_{int(datetime.fromisoformat(start['time']).timestamp())}"
+    channel = bot.get_partial_messageable(start["channel_id"], guild_id=state.guild_id)
+    with state.in_use():
+        try:
+            await post_poll(state, poll_id, poll_from_preview(preview_data, start["channel_id"], start["creator_id"]), channel, "poll_start")
+        except Exception as e:
+            metrics.inc("scheduled_polls_failed_total")
+            report_start_failure(preview_id, start, e)
+            raise
+        
+        if preview_data.get("start") is start:
+            del preview_data["start"]
+            state.save_preview(preview_id)
+    metrics.inc("scheduled_polls_started_total")
+
+def report_start_failure(preview_id: str, start: dict, error: Exception):
+    """Tell the creator of a scheduled poll by DM that it could not be posted"""
+    async def send():
+        user = bot.get_user(start["creator_id"]) or await bot.fetch_user(start["creator_id"])
+        await user.send(
+            f"⚠️ Your scheduled poll `{preview_id}` could not be posted in <#{start['channel_id']}>: {error}\n"
+            f"Use `/pollstart` to post it again or `/pollunschedule` to cancel it."
+        )
+    
+    bot.rest_queue.enqueue("poll_start", ("dm", start["creator_id"]), send, f"reporting the failed start of {preview_id}")
+
+def import_list(value, separator: Optional[str] = '|') -> List[str]:
+    """Read a list field of an imported poll: a JSON list, or a string split on separator (whitespace if None)"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value).split(separator) if item.strip()]
+
+def parse_poll_import(filename: str, data: bytes) -> List[dict]:
+    """Read the polls of a /pollimport file: a JSON list (or {"polls": [...]}) or a CSV with one poll per row"""
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError("The file must be UTF-8 encoded")
+    
+    if filename.lower().endswith('.csv'):
+        try:
+            entries = [{key.strip().lower(): value for key, value in row.items() if key} for row in csv.DictReader(io.StringIO(text))]
+        except csv.Error as e:
+            raise ValueError(f"Invalid CSV: {e}")
+    else:
+        try:
+            entries = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if isinstance(entries, dict):
+            entries = entries.get("polls")
+        if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+            raise ValueError("JSON must be a list of poll objects (or an object with a \"polls\" list)")
+    
+    if not entries:
+        raise ValueError("The file contains no polls")
+    if len(entries) > POLL_IMPORT_MAX_POLLS:
+        raise ValueError(f"At most {POLL_IMPORT_MAX_POLLS} polls can be imported at once")
+    return entries
+
+def validate_poll_import(entry: dict, guild: discord.Guild, default_channel_id: int) -> tuple:
+    """Check one imported poll, returning (preview_data, channel_id, start_time) and a list of problems"""
+    errors = []
+    
+    question = str(entry.get("question") or "").strip()
+    if not question or len(question) > 200:
+        errors.append("question must be 1-200 characters")
+    
+    titles = import_list(entry.get("titles"))
+    urls = import_list(entry.get("image_urls"))
+    emotes = entry.get("emotes")
+    emotes = import_list(emotes if isinstance(emotes, list) else str(emotes or "").replace('|', ' '), None)
+    # Lists get the same limits as the poll modals (one entry per line, 2000 characters per box)
+    if not 2 <= len(titles) <= 30:
+        errors.append("titles needs 2-30 entries")
+    if any(len(title) > EMBED_FIELD_NAME_LIMIT for title in titles):
+        errors.append(f"titles must be at most {EMBED_FIELD_NAME_LIMIT} characters each")
+    elif len("\n".join(titles)) > 2000:
+        errors.append("titles must be at most 2000 characters in total")
+    if len(urls) != len(titles):
+        errors.append(f"{len(urls)} image_urls for {len(titles)} titles")
+    elif not all(url.startswith(('http://', 'https://')) for url in urls):
+        errors.append("image_urls must start with http:// or https://")
+    elif len("\n".join(urls)) > 2000:
+        errors.append("image_urls must be at most 2000 characters in total")
+    if len(emotes) != len(titles):
+        errors.append(f"{len(emotes)} emotes for {len(titles)} titles")
+    elif any(len(emote) > 64 for emote in emotes):  # Even <a:name:id> custom emojis stay under 64 characters
+        errors.append("emotes must be single emojis")
+    
+    duration = entry.get("duration")
+    try:
+        duration = int(duration) if str(duration).isdigit() else parse_duration(str(duration or ""))
+        if duration <= 0:
+            raise ValueError
+    except ValueError:
+        errors.append("duration must be like 30m, 2h, 1d or a number of seconds")
+    
+    color = entry.get("color") or "blue"
+    if isinstance(color, bool) or (isinstance(color, int) and not 0 <= color <= 0xFFFFFF):
+        errors.append("color must be a color name, a hex code or a number from 0 to 16777215")
+    elif not isinstance(color, int):
+        color = parse_color(str(color))
     
-    embed = discord.Embed(title="📋 Command Role Permissions", color=0x00ff00)
+    # Role rules use the same syntax as the configuration modal, and must resolve completely
+    roles = bot.role_index(guild).resolve_fields(*(
+        ", ".join(import_list(entry.get(field), ',')) for field in ("multi_vote_roles", "single_vote_roles", "blocked_roles")
+    ))
+    skipped = describe_skipped_roles(roles)
+    if skipped:
+        errors.append(skipped.split("\n", 1)[1].replace("\n", "; "))
     
-    if not bot.role_config["enabled_roles"]:
-        embed.description = "No role permissions configured yet."
-    else:
-        for command_name, role_ids in bot.role_config["enabled_roles"].items():
-            if role_ids:
-                role_mentions = []
-                for role_id in role_ids:
-                    role = interaction.guild.get_role(role_id)
-                    if role:
-                        role_mentions.append(role.mention)
-                    else:
-                        role_mentions.append(f"<@&{role_id}> (deleted)")
-                
-                embed.add_field(
-                    name=f"Command: {command_name}",
-                    value=", ".join(role_mentions) if role_mentions else "No roles",
-                    inline=False
-                )
+    channel_id = default_channel_id
+    if entry.get("channel"):
+        match = re.fullmatch(r'<#(\d+)>|(\d+)', str(entry["channel"]).strip())
+        channel_id = int(match.group(1) or match.group(2)) if match else None
+        if not isinstance(guild.get_channel(channel_id or 0), discord.TextChannel):
+            errors.append(f"unknown text channel {entry['channel']}")
     
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    start_time = datetime.now()
+    if entry.get("start_time"):
+        try:
+            start_time = parse_start_time(str(entry["start_time"]))
+        except ValueError as e:
+            errors.append(str(e))
+    
+    if errors:
+        return None, errors
+    preview_data = {
+        "question": question,
+        "duration": duration,
+        "titles": titles,
+        "image_urls": urls,
+        "emotes": emotes,
+        "multi_vote_config": roles["multi_vote_config"],
+        "single_vote_roles": roles["single_vote_roles"],
+        "blocked_roles": roles["blocked_roles"],
+        "color": color,
+    }
+    return (preview_data, channel_id, start_time), errors
 
-@bot.tree.command(name="pollcreate", description="Create a poll preview (use /pollstart to actually start it)")
+@bot.tree.command(name="pollimport", description="Create and schedule many polls from a JSON or CSV file")
 @app_commands.describe(
-    question="The poll question",
-    duration="Poll duration (e.g., 30m, 2h, 1d, 1w, 1mo)",
-    emotes="Voting emotes (space separated, e.g., :thumbsup: :thumbsdown:)",
-    color="Embed color (hex code like #ff0000 or color name like red, blue, purple, etc.)"
+    file="JSON list or CSV file with one poll per entry (question, titles, image_urls, emotes, duration, ...)",
+    channel="Channel for polls that don't name one (optional - uses current channel if not specified)"
 )
 @guild_only()
-@admin_or_allowed_role("pollcreate")
-async def create_poll(interaction: discord.Interaction, question: str, duration: str, emotes: str, color: str = "blue"):
-    """Create a poll preview - use /pollstart to send it to a channel"""
+@admin_or_allowed_role("pollimport")
+async def import_polls(interaction: discord.Interaction, file: discord.Attachment, channel: Optional[discord.TextChannel] = None):
+    """Validate every poll in the file, save them as previews and schedule their staggered starts"""
+    
+    if file.size > POLL_IMPORT_MAX_BYTES:
+        await interaction.response.send_message(f"❌ The file is too large (max {POLL_IMPORT_MAX_BYTES // 1000} KB)!", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
     
     try:
-        duration_seconds = parse_duration(duration)
+        entries = parse_poll_import(file.filename, await file.read())
     except ValueError as e:
-        await interaction.response.send_message(f"❌ {str(e)}", ephemeral=True)
+        await interaction.followup.send(f"❌ {e}", ephemeral=True)
         return
     
-    # Parse color
-    embed_color = parse_color(color)
-    
-    # Parse emotes
-    emote_list = emotes.split()
-    if len(emote_list) < 2:
-        await interaction.response.send_message("❌ You need at least 2 emotes for voting!", ephemeral=True)
-        return
+    state = await bot.guild_state(interaction.guild_id)
+    with state.in_use():
+        default_channel_id = (channel or interaction.channel).id
+        results = {}  # entry number -> report line
+        starts = []
+        for number, entry in enumerate(entries, 1):
+            poll, errors = validate_poll_import(entry, interaction.guild, default_channel_id)
+            if errors:
+                results[number] = f"`#{number}` ❌ {'; '.join(errors)}"
+                continue
+            preview_data, channel_id, start_time = poll
+            preview_id = f"{interaction.id}_{number}"
+            preview_data["creator_id"] = interaction.user.id
+            state.poll_previews[preview_id] = preview_data
+            starts.append([start_time, preview_id, channel_id, interaction.user.id, number])
+        
+        # Space the starts out so a batch of polls due together doesn't burst into the rate limits
+        starts.sort()
+        for previous, current in zip(starts, starts[1:]):
+            current[0] = max(current[0], previous[0] + timedelta(seconds=POLL_IMPORT_STAGGER_SECONDS))
+        for start_time, preview_id, channel_id, creator_id, number in starts:
+            state.schedule_start(preview_id, start_time, channel_id, creator_id)
+            question = state.poll_previews[preview_id]["question"]
+            results[number] = f"`#{number}` ✅ **{question[:60]}** in <#{channel_id}> <t:{int(start_time.timestamp())}:R> (`{preview_id}`)"
     
-    if len(emote_list) > 30:
-        await interaction.response.send_message("❌ Maximum 30 emotes allowed!", ephemeral=True)
-        return
+    report = f"📥 Imported {len(starts)} of {len(entries)} polls\n" + "\n".join(results[number] for number in sorted(results))
+    if len(report) <= 2000:
+        await interaction.followup.send(report, ephemeral=True)
+    else:
+        await interaction.followup.send(
+            f"📥 Imported {len(starts)} of {len(entries)} polls, see the attached report",
+            file=discord.File(io.BytesIO(report.encode()), filename="poll_import_report.txt"),
+            ephemeral=True
+        )
+
+def poll_export_lines(poll_data: dict, file_format: str):
+    """Yield a poll's export one line at a time: the tallies, then every voter's options"""
+    titles = poll_data['titles']
+    if file_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        def line(*row):
+            writer.writerow(row)
+            text = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return text
+        
+        yield line("record", "user_id", "option_index", "option_title", "votes")
+        for option_index, (title, count) in enumerate(zip(titles, poll_data['votes'])):
+            yield line("tally", "", option_index, title, count)
+        for user_id, voted in poll_data['user_votes'].items():
+            for option_index, title in enumerate(titles):
+                if voted >> option_index & 1:
+                    yield line("vote", user_id, option_index, title, "")
+    else:
+        yield json.dumps({
+            "record": "poll", "question": poll_data['question'], "end_time": poll_data['end_time'],
+            "closed_at": poll_data.get('closed_at'), "winners": poll_data.get('winners'), "voters": len(poll_data['user_votes'])
+        }) + "\n"
+        for option_index, (title, count) in enumerate(zip(titles, poll_data['votes'])):
+            yield json.dumps({"record": "tally", "option_index": option_index, "option_title": title, "votes": count}) + "\n"
+        for user_id, voted in poll_data['user_votes'].items():
+            options = [option_index for option_index in range(len(titles)) if voted >> option_index & 1]
+            yield json.dumps({"record": "vote", "user_id": user_id, "options": options}) + "\n"
+
+def write_poll_export(poll_data: dict, file_format: str) -> tuple:
+    """Stream a poll's export into a temporary file, gzipping it when large; returns (file, gzipped)"""
+    export = tempfile.TemporaryFile()
+    text = io.TextIOWrapper(export, encoding='utf-8', newline='')
+    text.writelines(poll_export_lines(poll_data, file_format))
+    text.flush()
+    text.detach()
     
-    # Show configuration modal
-    modal = PollConfigModal(question, duration_seconds, emote_list, embed_color, is_preview=True)
-    await interaction.response.send_modal(modal)
+    gzipped = export.tell() > POLL_EXPORT_GZIP_BYTES
+    if gzipped:
+        export.seek(0)
+        compressed = tempfile.TemporaryFile()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as archive:
+            shutil.copyfileobj(export, archive)
+        export.close()
+        export = compressed
+    export.seek(0)
+    return export, gzipped
 
-@bot.tree.command(name="pollstart", description="Start a poll from a preview in a specific channel")
+@bot.tree.command(name="pollexport", description="Export a poll's tallies and per-user votes as a file")
 @app_commands.describe(
-    preview_id="The preview ID to start",
-    channel="Channel to send the poll to (optional - uses current channel if not specified)"
+    poll_id="ID of an active or closed poll",
+    file_format="File format (default: CSV)"
 )
+@app_commands.choices(file_format=[
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="Newline-delimited JSON", value="ndjson")
+])
 @guild_only()
-@admin_or_allowed_role("pollstart")
-async def start_poll(interaction: discord.Interaction, preview_id: str, channel: Optional[discord.TextChannel] = None):
-    """Start a poll from a preview"""
-    
-    if preview_id not in bot.poll_previews:
-        await interaction.response.send_message("❌ Preview not found! Use `/pollcreate` to create a preview first.", ephemeral=True)
-        return
-    
-    preview_data = bot.poll_previews[preview_id]
-    target_channel = channel or interaction.channel
-    
-    # Create poll ID
-    poll_id = str(interaction.id)
-    
-    # Convert preview to active poll
-    end_time = datetime.now() + timedelta(seconds=preview_data['duration'])
-    poll_data = {
-        "question": preview_data['question'],
-        "titles": preview_data['titles'],
-        "image_urls": preview_data['image_urls'],
-        "emotes": preview_data['emotes'],
-        "multi_vote_config": preview_data['multi_vote_config'],
-        "single_vote_roles": preview_data['single_vote_roles'],
-        "blocked_roles": preview_data['blocked_roles'],
-        "color": preview_data['color'],
-        "end_time": end_time.isoformat(),
-        "votes": {},
-        "user_votes": {},
-        "channel_id": target_channel.id,
-        "creator_id": interaction.user.id
-    }
-    
-    bot.active_polls[poll_id] = poll_data
-    bot.save_polls()
+@admin_or_allowed_role("pollexport")
+async def export_poll(interaction: discord.Interaction, poll_id: str, file_format: str = "csv"):
+    """Export an active or archived poll"""
     
-    # Create and send poll
-    view = AdvancedPollView(poll_id, poll_data)
-    embed = create_poll_embed(poll_data, poll_id)
+    state = await bot.guild_state(interaction.guild_id)
+    await interaction.response.defer(ephemeral=True, thinking=True)
     
-    await interaction.response.send_message(f"✅ Poll started in {target_channel.mention}!", ephemeral=True)
-    
-    # Send poll to target channel
-    message = await target_channel.send(embed=embed, view=view)
+    poll_data = state.active_polls.get(poll_id)
+    if poll_data is not None:
+        # Votes keep arriving while the file is written, so export a snapshot
+        poll_data = dict(poll_data, votes=array('I', poll_data['votes']), user_votes=dict(poll_data['user_votes']))
+    else:
+        with state.in_use():
+            poll_data = await state.persistence.read(state.storage.load_archived_poll, poll_id)
+    if poll_data is None:
+        await interaction.followup.send("❌ Poll not found!", ephemeral=True)
+        return
     
-    # Store message reference
-    bot.active_polls[poll_id]["message_id"] = message.id
-    bot.save_polls()
+    export, gzipped = await asyncio.to_thread(write_poll_export, poll_data, file_format)
+    filename = f"poll_{poll_id}.{file_format}" + (".gz" if gzipped else "")
+    try:
+        await interaction.followup.send(
+            f"📤 **{poll_data['question']}**: {len(poll_data['user_votes']):,} voters",
+            file=discord.File(export, filename=filename),
+            ephemeral=True
+        )
+    except discord.HTTPException as e:
+        await interaction.followup.send(f"❌ Could not send the export: {e}", ephemeral=True)
+    finally:
+        export.close()
 
 @bot.tree.command(name="polledit", description="Edit a poll preview")
 @app_commands.describe(preview_id="The preview ID to edit")
@@ -419,12 +3127,12 @@ async def start_poll(interaction: discord.Interaction, preview_id: str, channel:
 async def edit_poll(interaction: discord.Interaction, preview_id: str):
     """Edit a poll preview"""
     
-    if preview_id not in bot.poll_previews:
+    state = await bot.guild_state(interaction.guild_id)
+    preview_data = await state.get_preview(preview_id)
+    if preview_data is None:
         await interaction.response.send_message("❌ Preview not found!", ephemeral=True)
         return
     
-    preview_data = bot.poll_previews[preview_id]
-    
     # Show edit modal with current data
     modal = PollEditModal(preview_id, preview_data)
     await interaction.response.send_modal(modal)
@@ -470,6 +3178,7 @@ class PollConfigModal(ui.Modal, title="Poll Configuration"):
         max_length=1000
     )
     
+    @timed("modal", "PollConfigModal")
     async def on_submit(self, interaction: discord.Interaction):
         # Parse image titles
         titles = [title.strip() for title in self.image_titles.value.split('\n') if title.strip()]
@@ -482,67 +3191,28 @@ class PollConfigModal(ui.Modal, title="Poll Configuration"):
             await interaction.response.send_message(f"❌ Number of titles ({len(titles)}) must match number of emotes ({len(self.emotes)})!", ephemeral=True)
             return
         
-        # Parse role configurations
-        multi_vote_config = {}
-        single_vote_roles = []
-        blocked_roles = []
-        
-        if self.multi_vote_roles.value.strip():
-            for role_config in self.multi_vote_roles.value.split(','):
-                if ':' in role_config:
-                    role_part, count_part = role_config.strip().split(':', 1)
-                    role_id = self.extract_role_id(role_part.strip(), interaction.guild)
-                    if role_id:
-                        try:
-                            count = int(count_part.strip())
-                            multi_vote_config[str(role_id)] = count
-                        except ValueError:
-                            pass
-        
-        if self.single_vote_roles.value.strip():
-            for role_mention in self.single_vote_roles.value.split(','):
-                role_id = self.extract_role_id(role_mention.strip(), interaction.guild)
-                if role_id:
-                    single_vote_roles.append(role_id)
-        
-        if self.blocked_roles.value.strip():
-            for role_mention in self.blocked_roles.value.split(','):
-                role_id = self.extract_role_id(role_mention.strip(), interaction.guild)
-                if role_id:
-                    blocked_roles.append(role_id)
-        
-        if self.is_preview:
-            # Show image upload modal for preview
-            upload_modal = ImageUploadModal(
-                self.question, self.duration, self.emotes, titles,
-                multi_vote_config, single_vote_roles, blocked_roles, self.color, is_preview=True
-            )
-            await interaction.response.send_modal(upload_modal)
-        else:
-            # Direct poll creation (legacy)
-            upload_modal = ImageUploadModal(
-                self.question, self.duration, self.emotes, titles,
-                multi_vote_config, single_vote_roles, blocked_roles, self.color, is_preview=False
-            )
-            await interaction.response.send_modal(upload_modal)
-    
-    def extract_role_id(self, role_mention: str, guild: discord.Guild) -> Optional[int]:
-        """Extract role ID from mention or name"""
-        # Try to extract from mention format <@&123456>
-        match = re.match(r'<@&(\d+)>', role_mention)
-        if match:
-            return int(match.group(1))
-        
-        # If it starts with @, remove it and try to find role by name
-        if role_mention.startswith('@'):
-            role_mention = role_mention[1:]
-        
-        # Search for role by name
-        for role in guild.roles:
-            if role.name.lower() == role_mention.lower():
-                return role.id
+        # Parse role configurations; entries that don't resolve are reported once the poll is created
+        roles = bot.role_index(interaction.guild).resolve_fields(
+            self.multi_vote_roles.value, self.single_vote_roles.value, self.blocked_roles.value
+        )
         
-        return None
+        # Show image upload modal (for a preview, or legacy direct poll creation)
+        upload_modal = ImageUploadModal(
+            self.question, self.duration, self.emotes, titles,
+            roles["multi_vote_config"], roles["single_vote_roles"], roles["blocked_roles"], self.color,
+            is_preview=self.is_preview, role_warning=describe_skipped_roles(roles)
+        )
+        await interaction.response.send_modal(upload_modal)
+
+def describe_skipped_roles(roles: dict) -> Optional[str]:
+    """Summarize the role entries RoleNameIndex.resolve_fields skipped, or None if there were none"""
+    lines = [
+        f"{label}: {', '.join(entries)}"
+        for label, entries in (("Unknown roles", roles["unknown"]), ("Ambiguous role names (use a mention)", roles["ambiguous"]),
+                               ("Invalid entries (expected @role:count)", roles["invalid"]))
+        if entries
+    ]
+    return "⚠️ Skipped role entries:\n" + "\n".join(lines) if lines else None
 
 class PollEditModal(ui.Modal, title="Edit Poll Preview"):
     def __init__(self, preview_id: str, preview_data: dict):
@@ -576,6 +3246,7 @@ class PollEditModal(ui.Modal, title="Edit Poll Preview"):
         max_length=2000
     )
     
+    @timed("modal", "PollEditModal")
     async def on_submit(self, interaction: discord.Interaction):
         # Parse new data
         titles = [title.strip() for title in self.image_titles.value.split('\n') if title.strip()]
@@ -589,20 +3260,27 @@ class PollEditModal(ui.Modal, title="Edit Poll Preview"):
             await interaction.response.send_message(f"❌ Number of titles ({len(titles)}) must match number of emotes ({len(self.preview_data['emotes'])})!", ephemeral=True)
             return
         
-        # Update preview data
-        bot.poll_previews[self.preview_id]['question'] = self.question_field.value
-        bot.poll_previews[self.preview_id]['titles'] = titles
-        bot.poll_previews[self.preview_id]['image_urls'] = urls
-        bot.save_previews()
+        # Update preview data (it may have expired while the modal was open)
+        state = await bot.guild_state(interaction.guild_id)
+        preview_data = await state.get_preview(self.preview_id)
+        if preview_data is None:
+            await interaction.response.send_message("❌ Preview not found!", ephemeral=True)
+            return
+        
+        preview_data['question'] = self.question_field.value
+        preview_data['titles'] = titles
+        preview_data['image_urls'] = urls
+        state.save_preview(self.preview_id)
         
         # Create updated preview embed
-        embed = create_preview_embed(bot.poll_previews[self.preview_id], self.preview_id)
+        embed = create_preview_embed(preview_data, self.preview_id)
         
         await interaction.response.send_message("✅ Poll preview updated!", embed=embed, ephemeral=True)
 
 class ImageUploadModal(ui.Modal, title="Upload Images"):
     def __init__(self, question: str, duration: int, emotes: List[str], titles: List[str],
-                 multi_vote_config: dict, single_vote_roles: List[int], blocked_roles: List[int], color: int, is_preview: bool = False):
+                 multi_vote_config: dict, single_vote_roles: List[int], blocked_roles: List[int], color: int, is_preview: bool = False,
+                 role_warning: Optional[str] = None):
         super().__init__()
         self.question = question
         self.duration = duration
@@ -613,6 +3291,7 @@ class ImageUploadModal(ui.Modal, title="Upload Images"):
         self.blocked_roles = blocked_roles
         self.color = color
         self.is_preview = is_preview
+        self.role_warning = role_warning
     
     image_urls = ui.TextInput(
         label="Image URLs (one per line, must match title count)",
@@ -622,6 +3301,7 @@ class ImageUploadModal(ui.Modal, title="Upload Images"):
         max_length=2000
     )
     
+    @timed("modal", "ImageUploadModal")
     async def on_submit(self, interaction: discord.Interaction):
         # Parse image URLs
         urls = [url.strip() for url in self.image_urls.value.split('\n') if url.strip()]
@@ -636,6 +3316,7 @@ class ImageUploadModal(ui.Modal, title="Upload Images"):
                 await interaction.response.send_message(f"❌ Invalid URL format: {url[:50]}...", ephemeral=True)
                 return
         
+        state = await bot.guild_state(interaction.guild_id)
         if self.is_preview:
             # Create preview
             preview_id = str(interaction.id)
@@ -652,11 +3333,14 @@ class ImageUploadModal(ui.Modal, title="Upload Images"):
                 "creator_id": interaction.user.id
             }
             
-            bot.poll_previews[preview_id] = preview_data
-            bot.save_previews()
+            state.poll_previews[preview_id] = preview_data
+            state.save_preview(preview_id)
             
             embed = create_preview_embed(preview_data, preview_id)
-            await interaction.response.send_message(f"✅ Poll preview created! Use `/pollstart {preview_id}` to start it.", embed=embed, ephemeral=True)
+            content = f"✅ Poll preview created! Use `/pollstart {preview_id}` to start it."
+            if self.role_warning:
+                content += "\n" + self.role_warning
+            await interaction.response.send_message(content, embed=embed, ephemeral=True)
         else:
             # Legacy direct poll creation
             poll_id = str(interaction.id)
@@ -671,13 +3355,13 @@ class ImageUploadModal(ui.Modal, title="Upload Images"):
                 "blocked_roles": self.blocked_roles,
                 "color": self.color,
                 "end_time": end_time.isoformat(),
-                "votes": {},
+                "votes": empty_tally(len(self.titles)),
                 "user_votes": {},
+                "channel_id": interaction.channel_id,
                 "creator_id": interaction.user.id
             }
             
-            bot.active_polls[poll_id] = poll_data
-            bot.save_polls()
+            state.add_poll(poll_id, poll_data)
             
             view = AdvancedPollView(poll_id, poll_data)
             embed = create_poll_embed(poll_data, poll_id)
@@ -685,44 +3369,109 @@ class ImageUploadModal(ui.Modal, title="Upload Images"):
             await interaction.response.send_message(embed=embed, view=view)
             
             message = await interaction.original_response()
-            bot.active_polls[poll_id]["message_id"] = message.id
-            bot.save_polls()
+            state.active_polls[poll_id]["message_id"] = message.id
+            state.save_poll(poll_id)
+            if self.role_warning:
+                await interaction.followup.send(self.role_warning, ephemeral=True)
 
 def create_preview_embed(preview_data: dict, preview_id: str) -> discord.Embed:
-    """Create embed for poll preview"""
+    """Create embed for poll preview (cached until the preview is saved again)"""
+    embed = bot.embed_cache.get(("preview", preview_id))
+    if embed is not None:
+        return embed
+    
     embed = discord.Embed(
         title=f"📋 Poll Preview: {preview_data['question']}",
         description=f"Preview ID: `{preview_id}`\nDuration: {preview_data['duration']} seconds",
         color=preview_data.get('color', 0xffa500)
     )
+    start = preview_data.get('start')
+    if start:
+        start_time = int(datetime.fromisoformat(start['time']).timestamp())
+        embed.description += f"\nStarts <t:{start_time}:f> in <#{start['channel_id']}>"
     
-    # Add options preview
-    for i, (title, url) in enumerate(zip(preview_data['titles'], preview_data['image_urls'])):
+    # Add options preview; options beyond the field limit share the last field
+    names = [f"{emote} {title}" for emote, title in zip(preview_data['emotes'], preview_data['titles'])]
+    shown = len(names) if len(names) <= EMBED_MAX_FIELDS else EMBED_MAX_FIELDS - 1
+    for i, (name, url) in enumerate(zip(names[:shown], preview_data['image_urls'])):
         embed.add_field(
-            name=f"{preview_data['emotes'][i]} {title}",
+            name=truncate_text(name, EMBED_FIELD_NAME_LIMIT),
             value="Ready to vote",
             inline=True
         )
         
         if i == 0:
             embed.set_thumbnail(url=url)
+    if shown < len(names):
+        embed.add_field(name=f"…and {len(names) - shown} more", value=truncate_text(", ".join(names[shown:]), 1024), inline=False)
     
     embed.set_footer(text="Use /pollstart to send this poll to a channel")
+    bot.embed_cache.put(("preview", preview_id), embed)
     return embed
 
+def poll_rules_summary(poll_data: dict) -> List[str]:
+    """Lines describing a poll's role rules"""
+    rules = []
+    if poll_data['multi_vote_config']:
+        rules.append("Some roles can vote multiple times")
+    if poll_data['single_vote_roles']:
+        rules.append("Some roles limited to single votes")
+    if poll_data['blocked_roles']:
+        rules.append("Some roles cannot vote")
+    return rules
+
+def poll_page_options(poll_data: dict) -> int:
+    """Number of options shown (with vote buttons) on the poll message itself.
+    
+    All of them if their fields fit both the field count and the character total
+    (with room for every tally to grow to its largest), otherwise the first page.
+    """
+    rules = poll_rules_summary(poll_data)
+    # Title, description and a footer with the "showing N of M" note
+    size = len(f"📊 {poll_data['question']}") + len("Vote by clicking the reactions below!") + 100
+    if rules:
+        size += len("Voting Rules") + len("\n".join(rules))
+    
+    shown = 0
+    for emote, title in zip(poll_data['emotes'], poll_data['titles']):
+        size += min(len(f"{emote} {title}"), EMBED_FIELD_NAME_LIMIT) + len("4294967295 votes")
+        if shown + bool(rules) >= EMBED_MAX_FIELDS or size > EMBED_TOTAL_LIMIT:
+            return min(shown, POLL_PAGE_SIZE)
+        shown += 1
+    return shown
+
 def create_poll_embed(poll_data: dict, poll_id: str) -> discord.Embed:
-    """Create embed for poll display"""
+    """Create embed for poll display.
+    
+    The embed is built once per poll and cached with the tallies it shows; later calls
+    only rewrite the vote fields whose counts changed. The returned embed is shared,
+    so copy it before changing anything other than the vote counts.
+    """
+    votes = poll_data['votes']
+    entry = bot.embed_cache.get(("poll", poll_id))
+    if entry is not None:
+        embed, names, rendered = entry
+        if rendered != votes:
+            for i, (shown, vote_count) in enumerate(zip(rendered, votes)):
+                if shown != vote_count:
+                    embed.set_field_at(i, name=names[i], value=f"{vote_count} votes", inline=True)
+                    rendered[i] = vote_count
+        return embed
+    
     embed = discord.Embed(
         title=f"📊 {poll_data['question']}",
         description="Vote by clicking the reactions below!",
         color=poll_data.get('color', 0x3498db)
     )
     
-    # Add images and vote counts
-    for i, (title, url) in enumerate(zip(poll_data['titles'], poll_data['image_urls'])):
-        vote_count = poll_data['votes'].get(str(i), 0)
+    # Add images and vote counts, for the first page of options if they don't all fit
+    names = []
+    shown = poll_page_options(poll_data)
+    for i, (title, url) in enumerate(zip(poll_data['titles'][:shown], poll_data['image_urls'])):
+        vote_count = votes[i]
+        names.append(truncate_text(f"{poll_data['emotes'][i]} {title}", EMBED_FIELD_NAME_LIMIT))
         embed.add_field(
-            name=f"{poll_data['emotes'][i]} {title}",
+            name=names[i],
             value=f"{vote_count} votes",
             inline=True
         )
@@ -732,37 +3481,52 @@ def create_poll_embed(poll_data: dict, poll_id: str) -> discord.Embed:
             embed.set_thumbnail(url=url)
     
     # Add voting rules info
-    rules = []
-    if poll_data['multi_vote_config']:
-        rules.append("Some roles can vote multiple times")
-    if poll_data['single_vote_roles']:
-        rules.append("Some roles limited to single votes")
-    if poll_data['blocked_roles']:
-        rules.append("Some roles cannot vote")
-    
+    rules = poll_rules_summary(poll_data)
     if rules:
         embed.add_field(name="Voting Rules", value="\n".join(rules), inline=False)
     
     end_time = datetime.fromisoformat(poll_data['end_time'])
-    embed.set_footer(text=f"Poll ends: {end_time.strftime('%Y-%m-%d %H:%M:%S UTC')}")
+    footer = f"Poll ends: {end_time.strftime('%Y-%m-%d %H:%M:%S UTC')}"
+    if shown < len(poll_data['titles']):
+        footer += f" • Showing {shown} of {len(poll_data['titles'])} options, press 📄 for all"
+    embed.set_footer(text=footer)
+    
+    bot.embed_cache.put(("poll", poll_id), (embed, names, array('I', votes[:len(names)])))
+    return embed
+
+def create_sticky_embed(sticky_data: dict, channel_id: str) -> discord.Embed:
+    """Create the embed for an embed-type sticky note (cached until the sticky is replaced)"""
+    entry = bot.embed_cache.get(("sticky", channel_id))
+    if entry is not None and entry[0] is sticky_data:
+        return entry[1]
+    
+    embed = discord.Embed(
+        title=sticky_data.get("title", "Sticky Note"),
+        description=sticky_data["content"],
+        color=sticky_data.get("color", 0x3498db)
+    )
     
+    # Add custom footer text
+    footer_text = sticky_data.get("footer_text", "This is a sticky note")
+    embed.set_footer(text=f"📌 {footer_text}")
+    
+    # Add image if provided
+    if sticky_data.get("image_url"):
+        embed.set_image(url=sticky_data["image_url"])
+    
+    bot.embed_cache.put(("sticky", channel_id), (sticky_data, embed))
     return embed
 
 def get_poll_winners(poll_data: dict) -> List[int]:
     """Get the winning option(s) from poll data"""
-    if not poll_data['votes']:
+    votes = poll_data['votes']
+    max_votes = max(votes, default=0)
+    if max_votes == 0:
         return []
     
-    max_votes = max(poll_data['votes'].values())
-    winners = []
-    
-    for option_str, vote_count in poll_data['votes'].items():
-        if vote_count == max_votes:
-            winners.append(int(option_str))
-    
-    return winners
+    return [i for i, vote_count in enumerate(votes) if vote_count == max_votes]
 
-async def create_tiebreaker_poll(original_poll_data: dict, tied_options: List[int], interaction_or_channel):
+async def create_tiebreaker_poll(state: GuildState, original_poll_id: str, original_poll_data: dict, tied_options: List[int], interaction_or_channel):
     """Create a new poll for tiebreaker with only the tied options"""
     # Create new poll data with only tied options
     tied_titles = [original_poll_data['titles'][i] for i in tied_options]
@@ -772,7 +3536,11 @@ async def create_tiebreaker_poll(original_poll_data: dict, tied_options: List[in
     # Use same duration as original (or default to 1 hour)
     duration = 3600  # 1 hour default for tiebreaker
     
-    poll_id = f"tiebreaker_{int(datetime.now().timestamp())}"
+    # Named after the first poll of the chain and the round, so IDs stay unique within a close batch
+    # and repeated ties don't grow them past the custom_id limit
+    root_poll_id = original_poll_data.get('tiebreaker_of', original_poll_id)
+    tiebreaker_round = original_poll_data.get('tiebreaker_round', 0) + 1
+    poll_id = f"tiebreaker_{root_poll_id}_{tiebreaker_round}"
     end_time = datetime.now() + timedelta(seconds=duration)
     
     tiebreaker_data = {
@@ -785,61 +3553,75 @@ async def create_tiebreaker_poll(original_poll_data: dict, tied_options: List[in
         "blocked_roles": original_poll_data['blocked_roles'],
         "color": original_poll_data.get('color', 0x3498db),
         "end_time": end_time.isoformat(),
-        "votes": {},
+        "votes": empty_tally(len(tied_titles)),
         "user_votes": {},
-        "is_tiebreaker": True
+        "is_tiebreaker": True,
+        "tiebreaker_of": root_poll_id,
+        "tiebreaker_round": tiebreaker_round
     }
     
-    bot.active_polls[poll_id] = tiebreaker_data
-    bot.save_polls()
+    state.add_poll(poll_id, tiebreaker_data)
     
     # Create and send tiebreaker poll
     view = AdvancedPollView(poll_id, tiebreaker_data)
-    embed = create_poll_embed(tiebreaker_data, poll_id)
+    # Restyled on a copy, the cached poll embed is shared
+    embed = create_poll_embed(tiebreaker_data, poll_id).copy()
     embed.title = "🔥 " + embed.title[2:]  # Replace 📊 with 🔥 for tiebreaker
     embed.color = 0xff6b6b  # Red color for tiebreaker
     
     if hasattr(interaction_or_channel, 'send'):
         # It's a channel
-        message = await interaction_or_channel.send(embed=embed, view=view)
+        channel = interaction_or_channel
+        message = await bot.rest_queue.submit("poll_close", channel.id, functools.partial(channel.send, embed=embed, view=view))
     else:
         # It's an interaction
         message = await interaction_or_channel.followup.send(embed=embed, view=view)
     
-    bot.active_polls[poll_id]["message_id"] = message.id
-    bot.save_polls()
+    state.active_polls[poll_id]["channel_id"] = message.channel.id
+    state.active_polls[poll_id]["message_id"] = message.id
+    state.save_poll(poll_id)
 
-class AdvancedPollView(ui.View):
-    def __init__(self, poll_id: str, poll_data: dict):
-        # Calculate timeout
-        end_time = datetime.fromisoformat(poll_data['end_time'])
-        timeout_seconds = (end_time - datetime.now()).total_seconds()
-        timeout_seconds = max(1, min(timeout_seconds, 2147483))  # Discord's max timeout
-        
-        super().__init__(timeout=timeout_seconds)
-        self.poll_id = poll_id
-        
-        # Add reaction buttons
-        for i, emote in enumerate(poll_data['emotes']):
-            button = PollVoteButton(i, emote, poll_id)
-            self.add_item(button)
+async def locate_poll_channel(state: GuildState, poll_id: str) -> Optional[int]:
+    """Find and store the channel of a poll saved without channel_id, scanning the guild's channels once"""
+    poll_data = state.active_polls.get(poll_id)
+    if poll_data is None or "message_id" not in poll_data:
+        return None
+    if poll_data.get("channel_id"):
+        return poll_data["channel_id"]
     
-    async def on_timeout(self):
-        """Called when poll times out"""
-        if self.poll_id not in bot.active_polls:
-            return
-            
-        poll_data = bot.active_polls[self.poll_id]
+    guild = bot.get_guild(state.guild_id)
+    if guild is None:
+        return None
+    for channel in guild.text_channels:
+        try:
+            await bot.rest_queue.submit("migration", channel.id, functools.partial(channel.fetch_message, poll_data["message_id"]))
+        except discord.HTTPException:
+            continue
+        poll_data["channel_id"] = channel.id
+        state.save_poll(poll_id)
+        return channel.id
+    return None
+
+async def close_poll(state: GuildState, poll_id: str):
+    """Close a poll: show the results, start a tiebreaker if needed and drop its state"""
+    # Settle in-flight votes and stop accepting new ones before the results are read
+    if poll_id not in state.active_polls or not state.vote_queue.close(poll_id):
+        return
+    
+    with state.in_use():
+        poll_data = state.active_polls[poll_id]
+        bot.embed_refresher.cancel(poll_id)
         
         # Get winners
         winners = get_poll_winners(poll_data)
         
         # Disable all buttons
-        for item in self.children:
+        view = AdvancedPollView(poll_id, poll_data)
+        for item in view.children:
             item.disabled = True
-            
-        # Create results embed
-        embed = create_poll_embed(poll_data, self.poll_id)
+        
+        # Create results embed from a copy, the cached poll embed is shared
+        embed = create_poll_embed(poll_data, poll_id).copy()
         embed.title = "🔒 " + embed.title[2:]  # Replace 📊 with 🔒
         embed.color = 0x95a5a6  # Gray
         
@@ -857,114 +3639,301 @@ class AdvancedPollView(ui.View):
             embed.description = f"**🤝 Tie between: {', '.join(tied_titles)}**"
             embed.set_footer(text="This poll ended in a tie. A tiebreaker poll will be created.")
         
-        # Try to update message
+        # Edit the poll message by ID: a single REST call, no fetch. It replaces any queued vote refresh
         channel = None
-        try:
-            if "message_id" in poll_data and "channel_id" in poll_data:
-                channel = bot.get_channel(poll_data["channel_id"])
-                if channel:
-                    message = await channel.fetch_message(poll_data["message_id"])
-                    await message.edit(embed=embed, view=self)
-            elif "message_id" in poll_data:
-                # Fallback: search all channels in guild
-                guild = bot.get_guild(GUILD_ID)
-                if guild:
-                    for ch in guild.text_channels:
-                        try:
-                            message = await ch.fetch_message(poll_data["message_id"])
-                            await message.edit(embed=embed, view=self)
-                            channel = ch
-                            break
-                        except:
-                            continue
-        except Exception as e:
-            print(f"Error updating poll message: {e}")
+        channel_id = poll_data.get("channel_id") or await locate_poll_channel(state, poll_id)
+        if channel_id and "message_id" in poll_data:
+            channel = bot.get_partial_messageable(channel_id, guild_id=state.guild_id)
+            message = channel.get_partial_message(poll_data["message_id"])
+            try:
+                await bot.rest_queue.submit("poll_close", channel_id, functools.partial(message.edit, embed=embed, view=view), key=("poll_message", poll_id))
+            except discord.HTTPException as e:
+                print(f"Error updating poll message: {e}")
+        
+        # Keep the final results and votes for /pollexport, before a tiebreaker that may fail to send
+        state.archive_poll(poll_id, winners)
         
         # Create tiebreaker if needed
         if len(winners) > 1 and channel:
             await asyncio.sleep(2)  # Brief delay before creating tiebreaker
-            await create_tiebreaker_poll(poll_data, winners, channel)
+            await create_tiebreaker_poll(state, poll_id, poll_data, winners, channel)
+
+class AdvancedPollView(ui.View):
+    def __init__(self, poll_id: str, poll_data: dict):
+        # Buttons are persistent; closing is driven by the poll's end_time, not a view timeout
+        super().__init__(timeout=None)
+        self.poll_id = poll_id
         
-        # Clean up poll data
-        del bot.active_polls[self.poll_id]
-        bot.save_polls()
+        # Add reaction buttons for the options shown on the poll message; the rest are reached by browsing
+        shown = poll_page_options(poll_data)
+        for i, emote in enumerate(poll_data['emotes'][:shown]):
+            button = PollVoteButton(i, emote, poll_id)
+            self.add_item(button)
+        if shown < len(poll_data['emotes']):
+            self.add_item(PollBrowseButton(poll_id))
+
+# Label sets for votes_total, built once so counting a vote is a single dict update
+VOTE_RESULTS = {result: (("result", result),) for result in ("recorded", "duplicate", "limit", "blocked", "closed")}
 
-class PollVoteButton(ui.Button):
+def button_face(emote: str) -> tuple:
+    """Return the (emoji, label) of an option's vote button"""
+    # Try to use custom emote, fallback to label
+    emoji = None
+    label = None
+    
+    # Check if it's a custom emote (<:name:id> or <a:name:id>)
+    if emote.startswith('<') and emote.endswith('>'):
+        emoji = emote
+    # Check if it's a unicode emoji
+    elif len(emote) <= 2:
+        emoji = emote
+    else:
+        # Use as label if not a valid emoji
+        label = emote[:80]  # Discord button label limit
+    return emoji, label
+
+class PollVoteButton(ui.DynamicItem[ui.Button], template=r'poll:(?P<poll_id>[^:]+):(?P<option>\d+)'):
+    """Vote button with a deterministic custom_id, dispatched for any poll message after a restart"""
+    
     def __init__(self, option_index: int, emote: str, poll_id: str):
-        # Try to use custom emote, fallback to label
-        emoji = None
-        label = None
-        
-        # Check if it's a custom emote (<:name:id> or <a:name:id>)
-        if emote.startswith('<') and emote.endswith('>'):
-            emoji = emote
-        # Check if it's a unicode emoji
-        elif len(emote) <= 2:
-            emoji = emote
+        emoji, label = button_face(emote)
+        super().__init__(ui.Button(
+            style=discord.ButtonStyle.primary, emoji=emoji, label=label,
+            custom_id=f"poll:{poll_id}:{option_index}"
+        ))
+        self.option_index = option_index
+        self.poll_id = poll_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match: re.Match):
+        """Rebuild the button from a clicked component"""
+        emote = str(item.emoji) if item.emoji else (item.label or "")
+        return cls(int(match['option']), emote, match['poll_id'])
+    
+    @timed("component", "PollVoteButton")
+    async def callback(self, interaction: discord.Interaction):
+        await cast_vote(interaction, self.poll_id, self.option_index)
+
+async def cast_vote(interaction: discord.Interaction, poll_id: str, option_index: int):
+    """Queue a click on a poll option and answer it, from the poll message or a poll browser"""
+    state = await bot.guild_state(interaction.guild_id)
+    if poll_id not in state.active_polls:
+        result = "closed"
+    else:
+        # Resolve the user's vote limit from the poll's compiled rules (0 = blocked)
+        max_votes = state.get_poll_rules(poll_id).max_votes(role.id for role in interaction.user.roles)
+        if max_votes == 0:
+            result = "blocked"
         else:
-            # Use as label if not a valid emoji
-            label = emote[:80]  # Discord button label limit
-        
+            # Limit and duplicate checks happen when the poll's queue applies the vote
+            title = state.active_polls[poll_id]['titles'][option_index]
+            result = await state.vote_queue.submit(poll_id, interaction.user.id, option_index, max_votes)
+    metrics.inc("votes_total", VOTE_RESULTS[result])
+    
+    if result == "closed":
+        await interaction.response.send_message("❌ This poll is no longer active!", ephemeral=True)
+    elif result == "blocked":
+        await interaction.response.send_message("❌ You are not allowed to vote in this poll!", ephemeral=True)
+    elif result == "limit":
+        await interaction.response.send_message(f"❌ You have reached your vote limit ({max_votes} votes)!", ephemeral=True)
+    elif result == "duplicate":
+        await interaction.response.send_message("❌ You have already voted for this option!", ephemeral=True)
+    else:
+        # Acknowledge right away; the public tallies are refreshed in the background
+        await interaction.response.send_message(
+            f"✅ Your vote for **{title}** has been recorded!", ephemeral=True
+        )
+        # Votes cast from a poll browser refresh the poll message, not the browser
+        message = interaction.message
+        poll_data = state.active_polls.get(poll_id)
+        if poll_data and poll_data.get("message_id") not in (None, message.id) and poll_data.get("channel_id"):
+            channel = bot.get_partial_messageable(poll_data["channel_id"], guild_id=state.guild_id)
+            message = channel.get_partial_message(poll_data["message_id"])
+        bot.embed_refresher.request(state, poll_id, message)
+
+class PollBrowserVoteButton(ui.Button):
+    """Vote button on a poll browser page.
+    
+    An ordinary item of the browser's view: when a timed view stops, discord.py
+    unregisters the templates of its DynamicItems, which would leave every poll
+    message's PollVoteButtons dead until a restart.
+    """
+    
+    def __init__(self, option_index: int, emote: str, poll_id: str):
+        emoji, label = button_face(emote)
         super().__init__(style=discord.ButtonStyle.primary, emoji=emoji, label=label)
         self.option_index = option_index
         self.poll_id = poll_id
     
+    @timed("component", "PollBrowserVoteButton")
     async def callback(self, interaction: discord.Interaction):
-        if self.poll_id not in bot.active_polls:
-            await interaction.response.send_message("❌ This poll is no longer active!", ephemeral=True)
-            return
-        
-        poll_data = bot.active_polls[self.poll_id]
-        user_id = str(interaction.user.id)
-        
-        # Check if user is blocked
-        user_role_ids = [role.id for role in interaction.user.roles]
-        if any(role_id in poll_data['blocked_roles'] for role_id in user_role_ids):
-            await interaction.response.send_message("❌ You are not allowed to vote in this poll!", ephemeral=True)
-            return
-        
-        # Check voting limits
-        user_votes = poll_data['user_votes'].get(user_id, [])
-        max_votes = 1  # Default
-        
-        # Check if user has multi-vote role
-        for role_id in user_role_ids:
-            if str(role_id) in poll_data['multi_vote_config']:
-                max_votes = poll_data['multi_vote_config'][str(role_id)]
-                break
-        
-        # Check if already at vote limit
-        if len(user_votes) >= max_votes:
-            await interaction.response.send_message(f"❌ You have reached your vote limit ({max_votes} votes)!", ephemeral=True)
-            return
+        await cast_vote(interaction, self.poll_id, self.option_index)
+
+def truncate_text(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def split_field_value(value: str, limit: int = EMBED_FIELD_VALUE_LIMIT) -> List[str]:
+    """Split a field value into chunks of at most limit characters, at line breaks or spaces where possible"""
+    chunks = []
+    while len(value) > limit:
+        cut = max(value.rfind("\n", 0, limit + 1), value.rfind(" ", 0, limit + 1))
+        if cut <= 0:
+            cut = limit
+        chunks.append(value[:cut].rstrip())
+        value = value[cut:].lstrip()
+    chunks.append(value)
+    return chunks
+
+class EmbedPaginator(ui.View):
+    """Ephemeral embed that pages through a list of items.
+    
+    Items are rendered when the paginator opens and packed into pages of at most page_size
+    fields that stay within Discord's embed limits. A value too long for one field continues
+    in the next, so nothing is cut off. Rendered pages are reused for EMBED_PAGE_CACHE_SECONDS.
+    """
+    
+    def __init__(self, user_id: int, title: str, items: list, render_field, color: int = 0x00ff00,
+                 page_size: int = EMBED_PAGE_SIZE, empty: str = "Nothing to show."):
+        super().__init__(timeout=EMBED_PAGINATOR_TIMEOUT)
+        self.user_id = user_id
+        self.title = title
+        self.items = items
+        self.render_field = render_field  # item -> (field name, field value)
+        self.color = color
+        self.page_size = page_size
+        self.empty = empty
+        self.page = 0
+        self.layout = self.paginate()  # page -> entries shown on it
+        self.page_count = max(1, len(self.layout))
+        self.pages = {}  # page -> (monotonic time rendered, embed)
+        self.update_items()
+    
+    def paginate(self) -> List[list]:
+        """Render every item and pack the resulting (name, value) fields into pages"""
+        budget = EMBED_TOTAL_LIMIT - len(truncate_text(self.title, 256)) - EMBED_FOOTER_RESERVE
+        pages, fields, size = [], [], 0
+        for item in self.items:
+            name, value = self.render_field(item)
+            name = truncate_text(name, EMBED_FIELD_NAME_LIMIT)
+            for i, chunk in enumerate(split_field_value(value)):
+                field = (name if i == 0 else truncate_text(f"{name} (continued)", EMBED_FIELD_NAME_LIMIT), chunk)
+                if fields and (len(fields) >= self.page_size or size + len(field[0]) + len(field[1]) > budget):
+                    pages.append(fields)
+                    fields, size = [], 0
+                fields.append(field)
+                size += len(field[0]) + len(field[1])
+        if fields:
+            pages.append(fields)
+        return pages
+    
+    def page_items(self, page: int) -> list:
+        return self.layout[page] if page < len(self.layout) else []
+    
+    def page_fields(self, page: int) -> List[tuple]:
+        """The (name, value) fields of a page"""
+        return self.page_items(page)
+    
+    def render(self, page: int) -> discord.Embed:
+        cached = self.pages.get(page)
+        now = time.monotonic()
+        if cached and now - cached[0] < EMBED_PAGE_CACHE_SECONDS:
+            return cached[1]
         
-        # Check if already voted for this option
-        if self.option_index in user_votes:
-            await interaction.response.send_message("❌ You have already voted for this option!", ephemeral=True)
+        embed = discord.Embed(title=truncate_text(self.title, 256), color=self.color)
+        for name, value in self.page_fields(page):
+            embed.add_field(name=name, value=value, inline=False)
+        if not self.items:
+            embed.description = self.empty
+        if self.page_count > 1:
+            embed.set_footer(text=f"Page {page + 1}/{self.page_count} • {len(self.items)} entries")
+        self.pages[page] = (now, embed)
+        return embed
+    
+    def update_items(self):
+        """Sync the components with the current page"""
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+    
+    async def send(self, interaction: discord.Interaction):
+        """Reply with the first page; a single page with nothing else to click is sent without the view"""
+        navigation_only = all(item in (self.previous_page, self.next_page) for item in self.children)
+        if self.page_count == 1 and navigation_only:
+            await interaction.response.send_message(embed=self.render(0), ephemeral=True)
+        else:
+            await interaction.response.send_message(embed=self.render(0), view=self, ephemeral=True)
+    
+    async def show(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, self.page_count - 1))
+        self.update_items()
+        await interaction.response.edit_message(embed=self.render(self.page), view=self)
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.user_id
+    
+    @ui.button(emoji="◀️", style=discord.ButtonStyle.secondary, row=4)
+    async def previous_page(self, interaction: discord.Interaction, button: ui.Button):
+        await self.show(interaction, self.page - 1)
+    
+    @ui.button(emoji="▶️", style=discord.ButtonStyle.secondary, row=4)
+    async def next_page(self, interaction: discord.Interaction, button: ui.Button):
+        await self.show(interaction, self.page + 1)
+
+class PollBrowser(EmbedPaginator):
+    """Pages through every option of a large poll with live tallies and the page's vote buttons"""
+    
+    def __init__(self, user_id: int, poll_id: str, poll_data: dict):
+        self.poll_id = poll_id
+        self.poll_data = poll_data
+        super().__init__(
+            user_id, f"📊 {poll_data['question']}", list(range(len(poll_data['titles']))), self.render_option,
+            color=poll_data.get('color', 0x3498db), page_size=POLL_PAGE_SIZE
+        )
+    
+    def paginate(self) -> List[list]:
+        """Pages of POLL_PAGE_SIZE option indices; their short fields always fit, and are rendered when shown for live tallies"""
+        return [self.items[start:start + self.page_size] for start in range(0, len(self.items), self.page_size)]
+    
+    def page_fields(self, page: int) -> List[tuple]:
+        return [self.render_option(option_index) for option_index in self.page_items(page)]
+    
+    def render_option(self, option_index: int) -> tuple:
+        poll_data = self.poll_data
+        name = truncate_text(f"{poll_data['emotes'][option_index]} {poll_data['titles'][option_index]}", EMBED_FIELD_NAME_LIMIT)
+        return name, f"{poll_data['votes'][option_index]} votes"
+    
+    def update_items(self):
+        super().update_items()
+        for item in [item for item in self.children if isinstance(item, PollBrowserVoteButton)]:
+            self.remove_item(item)
+        for option_index in self.page_items(self.page):
+            self.add_item(PollBrowserVoteButton(option_index, self.poll_data['emotes'][option_index], self.poll_id))
+
+class PollBrowseButton(ui.DynamicItem[ui.Button], template=r'poll_browse:(?P<poll_id>[^:]+)'):
+    """Opens a PollBrowser for polls with more options than fit on the poll message"""
+    
+    def __init__(self, poll_id: str):
+        super().__init__(ui.Button(
+            style=discord.ButtonStyle.secondary, emoji="📄", label="All options",
+            custom_id=f"poll_browse:{poll_id}"
+        ))
+        self.poll_id = poll_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match: re.Match):
+        return cls(match['poll_id'])
+    
+    @timed("component", "PollBrowseButton")
+    async def callback(self, interaction: discord.Interaction):
+        poll_data = (await bot.guild_state(interaction.guild_id)).active_polls.get(self.poll_id)
+        if poll_data is None:
+            await interaction.response.send_message("❌ This poll is no longer active!", ephemeral=True)
             return
-        
-        # Add vote
-        option_key = str(self.option_index)
-        if option_key not in poll_data['votes']:
-            poll_data['votes'][option_key] = 0
-        poll_data['votes'][option_key] += 1
-        
-        # Track user vote
-        if user_id not in poll_data['user_votes']:
-            poll_data['user_votes'][user_id] = []
-        poll_data['user_votes'][user_id].append(self.option_index)
-        
-        # Save data
-        bot.active_polls[self.poll_id] = poll_data
-        bot.save_polls()
-        
-        # Update embed
-        embed = create_poll_embed(poll_data, self.poll_id)
-        await interaction.response.edit_message(embed=embed, view=self.view)
+        await PollBrowser(interaction.user.id, self.poll_id, poll_data).send(interaction)
 
 # Error handler for permission checks
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    bot.record_command(interaction, "denied" if isinstance(error, app_commands.CheckFailure) else "error")
     if isinstance(error, app_commands.CheckFailure):
         await interaction.response.send_message("❌ You don't have permission to use this command!", ephemeral=True)
     else:
@@ -993,16 +3962,14 @@ async def create_sticky(interaction: discord.Interaction, message_type: str, con
     """Create a sticky note in the current channel"""
     
     channel_id = str(interaction.channel.id)
+    state = await bot.guild_state(interaction.guild_id)
     
     # Delete existing sticky note if any
-    if channel_id in bot.sticky_notes:
-        try:
-            old_message_id = bot.sticky_notes[channel_id].get('message_id')
-            if old_message_id:
-                old_message = await interaction.channel.fetch_message(old_message_id)
-                await old_message.delete()
-        except:
-            pass
+    if channel_id in state.sticky_notes:
+        old_message_id = state.sticky_notes[channel_id].get('message_id')
+        if old_message_id:
+            bot.rest_queue.enqueue("command", interaction.channel.id, interaction.channel.get_partial_message(old_message_id).delete,
+                                   f"deleting sticky note in {channel_id}")
     
     # Validate image URL if provided
     if image_url and not image_url.startswith(('http://', 'https://')):
@@ -1022,13 +3989,14 @@ async def create_sticky(interaction: discord.Interaction, message_type: str, con
     }
     
     # Send initial sticky note
+    bot.embed_cache.invalidate(("sticky", channel_id))
     await interaction.response.send_message("✅ Creating sticky note...", ephemeral=True)
-    message_id = await bot.repost_sticky_note(interaction.channel, sticky_data)
+    message_id = await bot.rest_queue.submit("command", interaction.channel.id, functools.partial(bot.repost_sticky_note, interaction.channel, sticky_data))
     
     # Store sticky note data
     sticky_data["message_id"] = message_id
-    bot.sticky_notes[channel_id] = sticky_data
-    bot.save_sticky_notes()
+    state.sticky_notes[channel_id] = sticky_data
+    state.save_sticky_note(channel_id)
 
 @bot.tree.command(name="unsticky", description="Remove the sticky note from current channel")
 @guild_only()
@@ -1037,30 +4005,27 @@ async def remove_sticky(interaction: discord.Interaction):
     """Remove sticky note from current channel"""
     
     channel_id = str(interaction.channel.id)
+    state = await bot.guild_state(interaction.guild_id)
     
-    if channel_id not in bot.sticky_notes:
+    if channel_id not in state.sticky_notes:
         await interaction.response.send_message("❌ No sticky note found in this channel!", ephemeral=True)
         return
     
     # Check if user is creator or admin
-    sticky_data = bot.sticky_notes[channel_id]
+    sticky_data = state.sticky_notes[channel_id]
     if (sticky_data["creator_id"] != interaction.user.id and 
         not interaction.user.guild_permissions.administrator):
         await interaction.response.send_message("❌ You can only remove sticky notes you created!", ephemeral=True)
         return
     
     # Delete sticky message
-    try:
-        message_id = sticky_data.get('message_id')
-        if message_id:
-            message = await interaction.channel.fetch_message(message_id)
-            await message.delete()
-    except:
-        pass
+    message_id = sticky_data.get('message_id')
+    if message_id:
+        bot.rest_queue.enqueue("command", interaction.channel.id, interaction.channel.get_partial_message(message_id).delete,
+                               f"deleting sticky note in {channel_id}")
     
     # Remove from storage
-    del bot.sticky_notes[channel_id]
-    bot.save_sticky_notes()
+    state.delete_sticky_note(channel_id)
     
     await interaction.response.send_message("✅ Sticky note removed!", ephemeral=True)
 
@@ -1070,37 +4035,134 @@ async def remove_sticky(interaction: discord.Interaction):
 async def list_sticky(interaction: discord.Interaction):
     """List all active sticky notes in the server"""
     
-    if not bot.sticky_notes:
+    sticky_notes = (await bot.guild_state(interaction.guild_id)).sticky_notes
+    if not sticky_notes:
         await interaction.response.send_message("❌ No sticky notes found in this server!", ephemeral=True)
         return
     
-    embed = discord.Embed(title="📝 Active Sticky Notes", color=0x00ff00)
+    guild = interaction.guild
     
-    for channel_id, sticky_data in bot.sticky_notes.items():
-        channel = bot.get_channel(int(channel_id))
-        if channel and channel.guild.id == GUILD_ID:
-            creator = bot.get_user(sticky_data["creator_id"])
-            creator_name = creator.display_name if creator else "Unknown User"
-            
-            content_preview = sticky_data["content"][:100]
-            if len(sticky_data["content"]) > 100:
-                content_preview += "..."
-            
-            embed.add_field(
-                name=f"#{channel.name}",
-                value=f"**Type:** {sticky_data['type'].title()}\n"
-                      f"**Creator:** {creator_name}\n"
-                      f"**Content:** {content_preview}",
-                inline=False
-            )
+    # Mentions need no channel or user lookups
+    def render_field(entry):
+        channel_id, sticky_data = entry
+        channel = guild.get_channel(int(channel_id))
+        content_preview = sticky_data["content"][:100]
+        if len(sticky_data["content"]) > 100:
+            content_preview += "..."
+        return (
+            f"#{channel.name}" if channel else f"Deleted channel {channel_id}",
+            f"**Channel:** <#{channel_id}>\n"
+            f"**Type:** {sticky_data['type'].title()}\n"
+            f"**Creator:** <@{sticky_data['creator_id']}>\n"
+            f"**Content:** {content_preview}"
+        )
+    
+    paginator = EmbedPaginator(
+        interaction.user.id, "📝 Active Sticky Notes", list(sticky_notes.items()), render_field,
+        empty="No sticky notes found in this server."
+    )
+    await paginator.send(interaction)
+
+@bot.tree.command(name="botstats", description="Show bot performance statistics")
+@guild_only()
+@app_commands.default_permissions(administrator=True)
+async def bot_stats(interaction: discord.Interaction):
+    """Show hot-path metrics collected since startup"""
+    
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ You need Administrator permissions to use this command!", ephemeral=True)
+        return
+    
+    uptime = timedelta(seconds=int(time.time() - metrics.started))
+    vote_latency = metrics.histogram("handler_latency_seconds", (("kind", "component"), ("name", "PollVoteButton")))
+    flush_latency = metrics.histogram("persist_flush_seconds")
+    loop_lag = metrics.histogram("event_loop_lag")
+    refresher = bot.embed_refresher
+    
+    embed = discord.Embed(title="📈 Bot Statistics", description=f"Uptime: {uptime}", color=0x00ff00)
+    embed.add_field(
+        name="Votes",
+        value=f"**Recorded:** {metrics.counter('votes_total', VOTE_RESULTS['recorded']):,}\n"
+              f"**Rejected:** {metrics.counter_total('votes_total') - metrics.counter('votes_total', VOTE_RESULTS['recorded']):,}\n"
+              f"**Handler p50/p99:** ≤{vote_latency.quantile(0.5) * 1000:g} / ≤{vote_latency.quantile(0.99) * 1000:g} ms",
+        inline=False
+    )
+    embed.add_field(
+        name="Persistence",
+        value=f"**Flushes:** {flush_latency.count:,} (p99 ≤{flush_latency.quantile(0.99) * 1000:g} ms)\n"
+              f"**Bytes written:** {metrics.counter('persist_bytes_total'):,}",
+        inline=False
+    )
+    embed.add_field(
+        name="Discord API",
+        value=f"**REST calls:** {metrics.counter_total('rest_requests_total'):,}\n"
+              f"**429 retries:** {metrics.counter('rest_rate_limited_total'):,}\n"
+              f"**Queued actions:** {bot.rest_queue.depth:,} ({metrics.counter_total('rest_actions_total'):,} handled)\n"
+              f"**Poll embed edits:** {refresher.edits:,} ({refresher.saved:,} saved)\n"
+              f"**Sticky reposts:** {metrics.counter('sticky_reposts_total', (('result', 'reposted'),)):,}",
+        inline=False
+    )
+    embed.add_field(
+        name="Event Loop",
+        value=f"**Current lag:** {metrics.gauges.get(('event_loop_lag_seconds', ()), 0) * 1000:.1f} ms\n"
+              f"**Lag p99:** ≤{loop_lag.quantile(0.99) * 1000:g} ms",
+        inline=False
+    )
+    
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="loopstalls", description="Show the handlers that blocked the event loop the longest")
+@app_commands.describe(write_file="Also write the full stacks to the profile file")
+@guild_only()
+@app_commands.default_permissions(administrator=True)
+async def loop_stalls(interaction: discord.Interaction, write_file: bool = False):
+    """Show the worst event loop stalls caught by the watchdog"""
+    
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ You need Administrator permissions to use this command!", ephemeral=True)
+        return
+    
+    if not bot.watchdog:
+        await interaction.response.send_message("❌ The event loop watchdog is disabled. Set LOOP_WATCHDOG_MS to enable it.", ephemeral=True)
+        return
+    
+    offenders = bot.watchdog.offenders()
+    embed = discord.Embed(
+        title="🐢 Event Loop Stalls",
+        description=f"{bot.watchdog.stalls:,} stalls over {LOOP_WATCHDOG_MS:g} ms since startup",
+        color=0xff9900
+    )
+    
+    for entry in offenders[:10]:
+        # Innermost frames are the ones doing the blocking work
+        stack = "\n".join(entry['stack'][-5:])[-900:]
+        embed.add_field(
+            name=f"{entry['seconds'] * 1000:.0f} ms in {entry['handler']}",
+            value=f"```\n{stack or 'no stack captured'}\n```",
+            inline=False
+        )
+    
+    if not offenders:
+        embed.add_field(name="No stalls", value="The event loop has not been blocked past the threshold.", inline=False)
     
-    if not embed.fields:
-        embed.description = "No sticky notes found in this server."
+    if write_file:
+        size = await asyncio.to_thread(bot.watchdog.write_profile)
+        embed.set_footer(text=f"Wrote {LOOP_PROFILE_FILE} ({size:,} bytes)")
     
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 # Run the bot
 if __name__ == "__main__":
+    # Only the bot and CLI move state files; importing this module leaves the working directory alone
+    migrate_legacy_state()
+    
+    # Convert between the configured storage backend and JSON state files, one subdirectory per guild
+    if len(sys.argv) > 1 and sys.argv[1] in ("export-json", "import-json"):
+        directory = sys.argv[2] if len(sys.argv) > 2 else "json_export"
+        converted = convert_state(sys.argv[1], directory)
+        print(f"✅ {'Exported' if sys.argv[1] == 'export-json' else 'Imported'} state of {converted} guild(s) ({directory})")
+        exit(0)
+    
     # You'll need to add your bot token as a secret
     token = os.getenv('DISCORD_BOT_TOKEN')
     if not token:
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+class RecordingStorage(main.StorageBackend):
+    """Storage that records the batches it is given and notices calls that overlap"""
+    
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+        self.active = 0
+        self.overlapped = False
+        self.guard = threading.Lock()
+    
+    def enter(self):
+        with self.guard:
+            self.active += 1
+            self.overlapped |= self.active > 1
+    
+    def leave(self):
+        with self.guard:
+            self.active -= 1
+    
+    def write_batch(self, batch: dict):
+        self.enter()
+        try:
+            time.sleep(0.05)
+            if self.failures:
+                self.failures -= 1
+                raise OSError("disk full")
+            self.batches.append(batch)
+        finally:
+            self.leave()
+    
+    def load_preview(self, preview_id: str):
+        self.enter()
+        try:
+            time.sleep(0.01)
+            return {"question": preview_id}
+        finally:
+            self.leave()
+
+
+def make_state() -> SimpleNamespace:
+    return SimpleNamespace(role_config={"enabled_roles": {}}, active_polls={}, poll_previews={}, sticky_notes={})
+
+
+def test_reads_never_overlap_writes():
+    async def run():
+        storage = RecordingStorage()
+        state = make_state()
+        writer = main.PersistenceWriter(storage, state)
+        state.sticky_notes["1"] = {"content": "hi"}
+        writer.mark_dirty("sticky_notes", "1")
+        flush = asyncio.create_task(writer.flush())
+        await asyncio.sleep(0.01)  # The write is now running in its worker thread
+        reads = await asyncio.gather(*(writer.read(storage.load_preview, f"p{i}") for i in range(5)))
+        await flush
+        return storage, reads
+    
+    storage, reads = asyncio.run(run())
+    assert not storage.overlapped
+    assert [read["question"] for read in reads] == [f"p{i}" for i in range(5)]
+    assert len(storage.batches) == 1
+
+
+def test_failed_flush_restores_its_batch():
+    async def run():
+        storage = RecordingStorage(failures=1)
+        state = make_state()
+        writer = main.PersistenceWriter(storage, state)
+        state.active_polls["p1"] = {"question": "Old?"}
+        writer.mark_dirty("polls", "p1")
+        writer.add_vote("p1", 1, 0)
+        writer.archive("p0", {"question": "Closed"})
+        try:
+            await writer.flush()
+        except OSError:
+            pass
+        restored = writer.pending
+        
+        # The retry snapshots the record as it is now, and carries votes queued since
+        state.active_polls["p1"]["question"] = "New?"
+        writer.add_vote("p1", 2, 1)
+        await writer.flush()
+        return storage, writer, restored
+    
+    storage, writer, restored = asyncio.run(run())
+    assert restored == 3
+    assert writer.pending == 0
+    [batch] = storage.batches
+    assert batch["polls"] == {"p1": {"question": "New?"}}
+    assert batch["votes"] == [("p1", 1, 0), ("p1", 2, 1)]
+    assert batch["archive"] == {"p0": {"question": "Closed"}}
+
+
+def test_writer_task_retries_failed_writes(monkeypatch):
+    monkeypatch.setattr(main, "PERSIST_DEBOUNCE_SECONDS", 0.01)
+    monkeypatch.setattr(main, "PERSIST_RETRY_SECONDS", 0.01)
+    
+    async def run():
+        storage = RecordingStorage(failures=2)
+        state = make_state()
+        writer = main.PersistenceWriter(storage, state)
+        writer.start()
+        state.sticky_notes["1"] = {"content": "hi"}
+        writer.mark_dirty("sticky_notes", "1")
+        for _ in range(100):
+            if storage.batches:
+                break
+            await asyncio.sleep(0.02)
+        writer.stop()
+        return storage, writer
+    
+    storage, writer = asyncio.run(run())
+    assert storage.failures == 0
+    assert [batch["sticky_notes"] for batch in storage.batches] == [{"1": {"content": "hi"}}]
+    assert writer.idle()
@@ -0,0 +1,62 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+from discord.ui.view import ViewStore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+def make_poll(option_count: int) -> dict:
+    return {
+        "question": "Best image?",
+        "titles": [f"Option {i}" for i in range(option_count)],
+        "emotes": ["👍"] * option_count,
+        "votes": main.empty_tally(option_count),
+        "color": 0x3498db,
+    }
+
+
+def test_browser_timeout_keeps_poll_buttons_registered():
+    async def run():
+        store = ViewStore(SimpleNamespace())
+        store.add_dynamic_items(main.PollVoteButton, main.PollBrowseButton)
+        
+        # Posted as an ephemeral reply, then paged so its vote buttons are swapped, then timed out
+        browser = main.PollBrowser(1, "p1", make_poll(main.POLL_PAGE_SIZE * 2))
+        store.add_view(browser, 555)
+        browser.page = 1
+        browser.update_items()
+        store.add_view(browser, 555)
+        browser._dispatch_timeout()
+        await asyncio.sleep(0)
+        return store
+    
+    store = asyncio.run(run())
+    resolved = {item for pattern, item in store._dynamic_items.items() if pattern.fullmatch("poll:p1:3")}
+    assert resolved == {main.PollVoteButton}
+
+
+def test_paginator_splits_long_values_without_losing_data():
+    async def run():
+        mentions = [f"<@&{100000000000000000 + i}>" for i in range(300)]
+        items = [("pollcreate", mentions), ("pollstart", mentions[:3])]
+        paginator = main.EmbedPaginator(
+            1, "📋 Command Role Permissions", items,
+            lambda entry: (f"Command: {entry[0]}", ", ".join(entry[1]))
+        )
+        return mentions, [paginator.render(page) for page in range(paginator.page_count)]
+    
+    mentions, embeds = asyncio.run(run())
+    assert len(embeds) > 1
+    for embed in embeds:
+        assert len(embed) <= main.EMBED_TOTAL_LIMIT
+        assert len(embed.fields) <= main.EMBED_PAGE_SIZE
+        assert all(len(field.value) <= main.EMBED_FIELD_VALUE_LIMIT for field in embed.fields)
+    
+    # Every mention survives whole, in order, across the continued fields
+    values = [field.value for embed in embeds for field in embed.fields]
+    assert " ".join(values[:-1]).split(", ") == mentions
+    assert values[-1] == ", ".join(mentions[:3])
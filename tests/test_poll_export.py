@@ -0,0 +1,57 @@
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+def make_poll() -> dict:
+    poll_data = {
+        "question": "Best image?",
+        "titles": ["Cats, obviously", "Dogs"],
+        "end_time": "2025-01-01T00:00:00",
+        "closed_at": "2025-01-01T00:00:01",
+        "winners": [0],
+        "votes": main.empty_tally(2),
+        "user_votes": {},
+    }
+    for user_id, option_index in ((1, 0), (2, 0), (2, 1)):
+        main.record_vote(poll_data, user_id, option_index)
+    return poll_data
+
+
+def test_csv_export_lines():
+    lines = list(main.poll_export_lines(make_poll(), "csv"))
+    assert all(line.endswith("\r\n") and line.count("\r\n") == 1 for line in lines)
+    assert list(csv.reader(io.StringIO("".join(lines)))) == [
+        ["record", "user_id", "option_index", "option_title", "votes"],
+        ["tally", "", "0", "Cats, obviously", "2"],
+        ["tally", "", "1", "Dogs", "1"],
+        ["vote", "1", "0", "Cats, obviously", ""],
+        ["vote", "2", "0", "Cats, obviously", ""],
+        ["vote", "2", "1", "Dogs", ""],
+    ]
+
+
+def test_ndjson_export_lines():
+    records = [json.loads(line) for line in main.poll_export_lines(make_poll(), "ndjson")]
+    assert records == [
+        {"record": "poll", "question": "Best image?", "end_time": "2025-01-01T00:00:00",
+         "closed_at": "2025-01-01T00:00:01", "winners": [0], "voters": 2},
+        {"record": "tally", "option_index": 0, "option_title": "Cats, obviously", "votes": 2},
+        {"record": "tally", "option_index": 1, "option_title": "Dogs", "votes": 1},
+        {"record": "vote", "user_id": 1, "options": [0]},
+        {"record": "vote", "user_id": 2, "options": [0, 1]},
+    ]
+
+
+def test_large_exports_are_gzipped(monkeypatch):
+    monkeypatch.setattr(main, "POLL_EXPORT_GZIP_BYTES", 100)
+    export, gzipped = main.write_poll_export(make_poll(), "ndjson")
+    assert gzipped
+    assert gzip.decompress(export.read()).decode().count("\n") == 5
+    export.close()
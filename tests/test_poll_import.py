@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+@pytest.fixture
+def guild(monkeypatch):
+    monkeypatch.setattr(main.bot, "role_indexes", {})
+    return SimpleNamespace(
+        id=1, roles=[SimpleNamespace(id=2, name="VIP"), SimpleNamespace(id=3, name="Muted")],
+        get_channel=lambda channel_id: None,
+    )
+
+
+def make_entry(**fields) -> dict:
+    entry = {
+        "question": "Best image?",
+        "titles": ["A", "B"],
+        "image_urls": ["https://example.com/a.png", "https://example.com/b.png"],
+        "emotes": ["👍", "👎"],
+        "duration": "2h",
+    }
+    entry.update(fields)
+    return entry
+
+
+def test_parse_json_and_csv():
+    polls = [make_entry(), make_entry(question="Second?")]
+    assert main.parse_poll_import("polls.json", json.dumps(polls).encode()) == polls
+    assert main.parse_poll_import("polls.json", json.dumps({"polls": polls}).encode()) == polls
+    
+    csv_data = "\ufeffQuestion,Titles,Image_URLs,Emotes,Duration\nBest?,A|B,https://a|https://b,👍 👎,1d\n".encode()
+    [row] = main.parse_poll_import("polls.CSV", csv_data)
+    assert row == {"question": "Best?", "titles": "A|B", "image_urls": "https://a|https://b", "emotes": "👍 👎", "duration": "1d"}
+
+
+@pytest.mark.parametrize("filename, data, message", [
+    ("polls.json", b"\xff\xfe", "UTF-8"),
+    ("polls.json", b"{not json", "Invalid JSON"),
+    ("polls.json", b'{"polls": "nope"}', "list of poll objects"),
+    ("polls.json", b"[]", "no polls"),
+    ("polls.json", json.dumps([{}] * (main.POLL_IMPORT_MAX_POLLS + 1)).encode(), "At most"),
+])
+def test_parse_rejects_bad_files(filename, data, message):
+    with pytest.raises(ValueError, match=message):
+        main.parse_poll_import(filename, data)
+
+
+def test_validate_builds_a_preview(guild):
+    entry = make_entry(titles="A | B", emotes="👍|👎", color="#ff0000", multi_vote_roles="VIP:3", blocked_roles=["Muted"])
+    (preview_data, channel_id, start_time), errors = main.validate_poll_import(entry, guild, 10)
+    assert errors == []
+    assert channel_id == 10
+    assert abs((start_time - datetime.now()).total_seconds()) < 5
+    assert preview_data["titles"] == ["A", "B"]
+    assert preview_data["emotes"] == ["👍", "👎"]
+    assert preview_data["duration"] == 7200
+    assert preview_data["color"] == 0xff0000
+    assert preview_data["multi_vote_config"] == {"2": 3}
+    assert preview_data["blocked_roles"] == [3]
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({"question": ""}, "question"),
+    ({"titles": ["A"], "image_urls": ["https://a"], "emotes": ["👍"]}, "titles needs 2-30"),
+    ({"image_urls": ["https://a", "ftp://b"]}, "http"),
+    ({"emotes": ["👍"]}, "1 emotes for 2 titles"),
+    ({"duration": "soon"}, "duration"),
+    ({"color": True}, "color"),
+    ({"color": 99999999}, "color"),
+    ({"blocked_roles": "Nobody"}, "Unknown roles: Nobody"),
+    ({"channel": "<#42>"}, "unknown text channel"),
+    ({"start_time": "2000-01-01T00:00"}, "in the past"),
+])
+def test_validate_reports_problems(guild, fields, message):
+    result, errors = main.validate_poll_import(make_entry(**fields), guild, 10)
+    assert result is None
+    assert any(message in error for error in errors), errors
+
+
+def test_validate_accepts_integer_colors(guild):
+    (preview_data, _, _), errors = main.validate_poll_import(make_entry(color=0x00ff00, duration=600), guild, 10)
+    assert errors == []
+    assert preview_data["color"] == 0x00ff00
+    assert preview_data["duration"] == 600
+
+
+def test_parse_start_time():
+    delayed = main.parse_start_time("30m")
+    assert timedelta(minutes=29) < delayed - datetime.now() <= timedelta(minutes=30)
+    
+    tomorrow = (datetime.now() + timedelta(days=1)).replace(microsecond=0)
+    assert main.parse_start_time(tomorrow.isoformat()) == tomorrow
+    aware = tomorrow.astimezone()
+    assert main.parse_start_time(aware.isoformat()) == tomorrow
+    
+    with pytest.raises(ValueError, match="ISO date/time"):
+        main.parse_start_time("next tuesday")
+    with pytest.raises(ValueError, match="in the past"):
+        main.parse_start_time((datetime.now() - timedelta(hours=1)).isoformat())
+    with pytest.raises(ValueError, match="days away"):
+        main.parse_start_time(f"{int(main.PREVIEW_TTL_DAYS) + 1}d")
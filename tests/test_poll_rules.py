@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+def make_rules(multi_vote=None, single_vote=(), blocked=()) -> main.PollRules:
+    # Role IDs come back from JSON as strings in multi_vote_config's keys
+    return main.PollRules({
+        "multi_vote_config": {str(role_id): count for role_id, count in (multi_vote or {}).items()},
+        "single_vote_roles": list(single_vote),
+        "blocked_roles": list(blocked),
+    })
+
+
+def test_open_poll_allows_one_vote():
+    assert make_rules().max_votes([]) == 1
+    assert make_rules().max_votes([7]) == 1
+
+
+def test_most_generous_multi_vote_role_wins():
+    rules = make_rules(multi_vote={1: 3, 2: 5})
+    assert rules.max_votes([1]) == 3
+    assert rules.max_votes([1, 2]) == 5
+    assert rules.max_votes([7]) == 1
+
+
+def test_blocked_role_overrides_everything():
+    rules = make_rules(multi_vote={1: 3}, blocked=[9])
+    assert rules.max_votes([1, 9]) == 0
+    assert rules.max_votes(iter([9])) == 0
+
+
+def test_single_vote_roles_gate_eligibility():
+    rules = make_rules(multi_vote={1: 3}, single_vote=[4])
+    assert rules.max_votes([7]) == 0  # Not listed anywhere: not eligible
+    assert rules.max_votes([]) == 0
+    assert rules.max_votes([4]) == 1
+    assert rules.max_votes([4, 1]) == 3  # Multi-vote roles are eligible too
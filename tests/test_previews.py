@@ -0,0 +1,85 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import discord
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+def make_state(tmp_path, preview_times: dict) -> main.GuildState:
+    """A GuildState over an empty JSON store whose bot only has what preview expiry touches"""
+    bot = SimpleNamespace(
+        start_scheduler=SimpleNamespace(deadlines={}, cancel=lambda job_id: None),
+        embed_cache=main.EmbedCache(8),
+    )
+    storage = main.JsonStorage(str(tmp_path))
+    loaded = {
+        "storage": storage, "role_config": {"enabled_roles": {}}, "active_polls": {},
+        "preview_times": {}, "sticky_notes": {},
+    }
+    state = main.GuildState(bot, 1, loaded)
+    state.preview_times.update(preview_times)
+    return state
+
+
+def test_previews_expire_by_last_use(tmp_path):
+    old_id = str(discord.utils.time_snowflake(discord.utils.utcnow() - timedelta(days=main.PREVIEW_TTL_DAYS + 5)))
+    stale = (datetime.now() - timedelta(days=main.PREVIEW_TTL_DAYS + 1)).isoformat()
+    recent = (datetime.now() - timedelta(days=1)).isoformat()
+    state = make_state(tmp_path, {
+        f"{old_id}_edited": recent,
+        f"{old_id}_stale": stale,
+        f"{old_id}_legacy": None,  # Saved before last_used was recorded: dated by its snowflake
+        f"{old_id}_scheduled": stale,
+    })
+    state.poll_previews[f"{old_id}_scheduled"] = {"start": {"time": recent}}
+    
+    assert state.expire_previews() == 2
+    assert set(state.preview_times) == {f"{old_id}_edited", f"{old_id}_scheduled"}
+
+
+def test_saving_a_preview_marks_it_used(tmp_path):
+    state = make_state(tmp_path, {})
+    state.poll_previews["1_a"] = {"question": "Next?"}
+    state.save_preview("1_a")
+    assert state.preview_times["1_a"] == state.poll_previews["1_a"]["last_used"]
+    assert state.expire_previews() == 0
+
+
+def test_failed_scheduled_start_keeps_the_schedule(tmp_path, monkeypatch):
+    class BrokenChannel:
+        id = 10
+        
+        async def send(self, **kwargs):
+            raise OSError("Missing Access")
+    
+    reported = []
+    monkeypatch.setattr(main.bot, "get_partial_messageable", lambda channel_id, guild_id=None: BrokenChannel())
+    monkeypatch.setattr(main, "report_start_failure", lambda preview_id, start, error: reported.append(preview_id))
+    
+    async def run():
+        state = main.GuildState(main.bot, 1, {
+            "storage": main.JsonStorage(str(tmp_path)), "role_config": {"enabled_roles": {}}, "active_polls": {},
+            "preview_times": {"1_a": None}, "sticky_notes": {},
+        })
+        start = {"time": datetime.now().isoformat(), "channel_id": 10, "creator_id": 20}
+        state.poll_previews["1_a"] = {
+            "question": "Next?", "duration": 3600, "titles": ["A", "B"], "image_urls": ["https://a", "https://b"],
+            "emotes": ["👍", "👎"], "multi_vote_config": {}, "single_vote_roles": [], "blocked_roles": [],
+            "color": 0x3498db, "start": start,
+        }
+        try:
+            await main.start_scheduled_poll(state, "1_a")
+        except OSError:
+            pass
+        return state, start
+    
+    state, start = asyncio.run(run())
+    # The registration is rolled back, the schedule kept and the creator told
+    assert state.active_polls == {}
+    assert state.poll_previews["1_a"]["start"] is start
+    assert reported == ["1_a"]
@@ -0,0 +1,40 @@
+import asyncio
+import os
+import sys
+
+import discord
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+def test_retried_action_is_superseded_by_newer_key():
+    async def run():
+        queue = main.RestQueue(workers=1)
+        queue.start()
+        calls = []
+        rate_limited = asyncio.Event()
+        
+        async def stale_edit():
+            calls.append("stale")
+            if len(calls) == 1:
+                rate_limited.set()
+                raise discord.RateLimited(0.05)
+            return "stale"
+        
+        async def fresh_edit():
+            calls.append("fresh")
+            return "fresh"
+        
+        stale = queue.submit("poll_refresh", 1, stale_edit, key=("poll_message", "p1"))
+        await rate_limited.wait()
+        await asyncio.sleep(0)  # Let the worker requeue the rate-limited edit
+        fresh = queue.submit("poll_refresh", 1, fresh_edit, key=("poll_message", "p1"))
+        results = await asyncio.gather(stale, fresh)
+        queue.stop()
+        return calls, results
+    
+    calls, results = asyncio.run(run())
+    # The requeued edit is dropped instead of landing after the newer one
+    assert calls == ["stale", "fresh"]
+    assert results == [None, "fresh"]
@@ -0,0 +1,45 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+def make_index() -> main.RoleNameIndex:
+    roles = [
+        SimpleNamespace(id=1, name="Members"),
+        SimpleNamespace(id=2, name="VIP"),
+        SimpleNamespace(id=3, name="Muted"),
+        SimpleNamespace(id=4, name="Helper"),
+        SimpleNamespace(id=5, name="helper"),  # Same name once casefolded
+    ]
+    return main.RoleNameIndex(roles)
+
+
+def test_resolve_fields_parses_every_field():
+    roles = make_index().resolve_fields("@vip:3, <@&1>: 2", "members, <@&99>", "MUTED")
+    assert roles["multi_vote_config"] == {"2": 3, "1": 2}
+    assert roles["single_vote_roles"] == [1, 99]  # Mentions are taken as given
+    assert roles["blocked_roles"] == [3]
+    assert roles["unknown"] == roles["ambiguous"] == roles["invalid"] == []
+
+
+def test_resolve_fields_reports_skipped_entries():
+    roles = make_index().resolve_fields("vip, Nobody:2", "helper", " , ghost")
+    assert roles["invalid"] == ["vip"]  # Missing its vote count
+    assert roles["unknown"] == ["Nobody", "ghost"]
+    assert roles["ambiguous"] == ["helper"]
+    assert roles["multi_vote_config"] == {}
+    assert roles["single_vote_roles"] == roles["blocked_roles"] == []
+    assert main.describe_skipped_roles(roles).startswith("⚠️ Skipped role entries:")
+
+
+def test_index_follows_role_events():
+    index = make_index()
+    renamed = SimpleNamespace(id=2, name="VIP")
+    index.remove(renamed)
+    renamed.name = "Patron"
+    index.add(renamed)
+    assert index.resolve("vip") == (None, "unknown")
+    assert index.resolve("@patron") == (2, None)
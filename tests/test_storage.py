@@ -0,0 +1,139 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+def make_poll(option_count: int = 3) -> dict:
+    return {
+        "question": "Best image?",
+        "titles": [f"Option {i}" for i in range(option_count)],
+        "image_urls": [f"https://example.com/{i}.png" for i in range(option_count)],
+        "emotes": ["👍"] * option_count,
+        "multi_vote_config": {},
+        "single_vote_roles": [],
+        "blocked_roles": [],
+        "color": 0x3498db,
+        "end_time": (datetime.now() + timedelta(hours=1)).isoformat(),
+        "votes": main.empty_tally(option_count),
+        "user_votes": {},
+        "channel_id": 10,
+        "creator_id": 20,
+    }
+
+
+def open_storage(backend: str, directory) -> main.StorageBackend:
+    if backend == "sqlite":
+        return main.SQLiteStorage(os.path.join(directory, main.DATABASE_FILE))
+    return main.JsonStorage(str(directory))
+
+
+def write(storage: main.StorageBackend, polls=None, votes=()):
+    """Write the given poll saves and votes to storage as one batch, the way PersistenceWriter flushes them"""
+    batch = main.new_batch()
+    batch["polls"] = dict(polls or {})
+    batch["votes"] = list(votes)
+    storage.write_batch(batch)
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_votes_survive_restart(backend, tmp_path):
+    storage = open_storage(backend, tmp_path)
+    storage.load_polls()
+    poll = make_poll()
+    write(storage, {"p1": poll})
+    
+    # Votes written alongside the poll, then on their own (the journal path for JSON)
+    write(storage, {"p1": poll}, [("p1", 1, 0), ("p1", 2, 1)])
+    write(storage, votes=[("p1", 1, 2), ("p1", 3, 1), ("p1", 3, 1)])
+    storage.close()
+    
+    storage = open_storage(backend, tmp_path)
+    loaded = storage.load_polls()["p1"]
+    assert list(loaded["votes"]) == [1, 2, 1]
+    assert loaded["user_votes"] == {1: 0b101, 2: 0b010, 3: 0b010}
+    assert loaded["titles"] == poll["titles"]
+    assert storage.load_index()["poll_deadlines"] == {"p1": poll["end_time"]}
+    storage.close()
+
+
+def test_journal_replay_skips_torn_trailing_line(tmp_path):
+    storage = main.JsonStorage(str(tmp_path))
+    storage.load_polls()
+    write(storage, {"p1": make_poll()})
+    write(storage, votes=[("p1", 1, 0), ("p1", 2, 0)])
+    storage.close()
+    
+    # A crash mid-append leaves a partial record without its newline
+    with open(tmp_path / main.VOTE_JOURNAL_FILE, "a", encoding="utf-8") as f:
+        f.write('["p1",3,')
+    
+    storage = main.JsonStorage(str(tmp_path))
+    loaded = storage.load_polls()["p1"]
+    assert list(loaded["votes"]) == [2, 0, 0]
+    assert set(loaded["user_votes"]) == {1, 2}
+    
+    # Votes journaled after the restart are not glued onto the torn record
+    write(storage, votes=[("p1", 4, 1)])
+    storage.close()
+    storage = main.JsonStorage(str(tmp_path))
+    assert list(storage.load_polls()["p1"]["votes"]) == [2, 1, 0]
+    storage.close()
+
+
+def test_torn_journal_without_complete_records(tmp_path):
+    storage = main.JsonStorage(str(tmp_path))
+    storage.load_polls()
+    write(storage, {"p1": make_poll()})
+    storage.close()
+    
+    with open(tmp_path / main.VOTE_JOURNAL_FILE, "a", encoding="utf-8") as f:
+        f.write('["p1",3,')
+    
+    storage = main.JsonStorage(str(tmp_path))
+    assert list(storage.load_polls()["p1"]["votes"]) == [0, 0, 0]
+    write(storage, votes=[("p1", 4, 1)])
+    storage.close()
+    storage = main.JsonStorage(str(tmp_path))
+    assert list(storage.load_polls()["p1"]["votes"]) == [0, 1, 0]
+    storage.close()
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_export_import_round_trip(backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "STORAGE_BACKEND", backend)
+    monkeypatch.setattr(main, "DATA_DIRECTORY", str(tmp_path / "data"))
+    poll = make_poll()
+    storage = main.create_storage(main.guild_directory(42))
+    storage.load_polls()
+    batch = main.new_batch()
+    batch["config"] = {"enabled_roles": {"poll": [7]}}
+    batch["polls"] = {"p1": poll}
+    batch["votes"] = [("p1", 1, 0), ("p1", 2, 2)]
+    batch["archive"] = {"old": dict(make_poll(), closed_at="2025-01-01T00:00:00", winners=[0])}
+    batch["previews"] = {"pv1": {"question": "Next?"}}
+    batch["sticky_notes"] = {"99": {"content": "Read the rules"}}
+    storage.write_batch(batch)
+    storage.close()
+    
+    # Exported from a storage the CLI opens cold, then imported into an empty data directory
+    export = tmp_path / "export"
+    assert main.convert_state("export-json", str(export)) == 1
+    assert main.read_json_file(str(export / "42" / main.PREVIEWS_FILE), {}) == {"pv1": {"question": "Next?"}}
+    monkeypatch.setattr(main, "DATA_DIRECTORY", str(tmp_path / "restored"))
+    assert main.convert_state("import-json", str(export)) == 1
+    
+    storage = main.create_storage(main.guild_directory(42))
+    assert storage.load_config() == {"enabled_roles": {"poll": [7]}}
+    loaded = storage.load_polls()["p1"]
+    assert list(loaded["votes"]) == [1, 0, 1]
+    assert loaded["user_votes"] == {1: 0b001, 2: 0b100}
+    assert storage.load_previews() == {"pv1": {"question": "Next?"}}
+    assert storage.load_sticky_notes() == {"99": {"content": "Read the rules"}}
+    assert storage.archived_poll_ids() == ["old"]
+    assert storage.load_archived_poll("old")["winners"] == [0]
+    storage.close()
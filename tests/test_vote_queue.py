@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+def make_state(option_count: int = 5) -> SimpleNamespace:
+    """Just enough GuildState for PollVoteQueue: the active polls and a log of saved votes"""
+    saved = []
+    poll = {"votes": main.empty_tally(option_count), "user_votes": {}}
+    return SimpleNamespace(
+        active_polls={"p1": poll},
+        saved=saved,
+        append_vote=lambda poll_id, user_id, option_index: saved.append((poll_id, user_id, option_index)),
+    )
+
+
+def test_concurrent_submits_respect_max_votes():
+    async def run():
+        state = make_state()
+        queue = main.PollVoteQueue(state)
+        # Every user clicks every option at once; each may only land max_votes of them
+        results = await asyncio.gather(*(
+            queue.submit("p1", user_id, option_index, max_votes)
+            for user_id, max_votes in ((1, 1), (2, 2), (3, 5))
+            for option_index in range(5)
+            for _ in range(3)
+        ))
+        return state, results
+    
+    state, results = asyncio.run(run())
+    user_votes = state.active_polls["p1"]["user_votes"]
+    assert {user_id: voted.bit_count() for user_id, voted in user_votes.items()} == {1: 1, 2: 2, 3: 5}
+    assert results.count("recorded") == 8 == len(state.saved)
+    assert sum(state.active_polls["p1"]["votes"]) == 8
+
+
+def test_submits_after_close_are_closed():
+    async def run():
+        state = make_state()
+        queue = main.PollVoteQueue(state)
+        queued = queue.submit("p1", 1, 0, 1)
+        assert queue.close("p1")
+        assert not queue.close("p1")  # Already closing
+        late = await queue.submit("p1", 2, 1, 1)
+        return state, await queued, late
+    
+    state, queued, late = asyncio.run(run())
+    # Votes queued before the close still count; later ones are turned away
+    assert queued == "recorded"
+    assert late == "closed"
+    assert state.saved == [("p1", 1, 0)]